@@ -0,0 +1,227 @@
+"""
+Offline throughput benchmark for the bot's slash commands.
+
+Drives the real cogs with synthetic application contexts against a stub
+Lavalink node (see stub_lavalink.py), simulating many guilds issuing
+commands at the same time. No Discord or Lavalink connection is needed.
+
+Usage: python -m benchmarks.bench_commands --guilds 200 --tracks 10 --latency 20
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import tracemalloc
+import types
+import discord
+import wavelink
+from benchmarks.stub_lavalink import StubLavalink
+from cogs.music.Play import PlayCog
+from cogs.music.Queue import QueueCog
+from cogs.music.Skip import SkipCog
+from cogs.music.Stop import StopCog
+from cogs.music.Volume import VolumeCog
+from cogs.utility.Info import Info
+from cogs.utility.Ping import Ping
+from utils import responses
+from utils.guild_scheduler import guild_scheduler
+from utils.metrics import metrics
+from utils.search_cache import track_cache
+
+_ids = itertools.count(10**17)
+
+class FakeBot(discord.Bot):
+    """A bot that never logs in, with a fixed user and gateway latency."""
+
+    def __init__(self, gateway_latency: float):
+        super().__init__(intents=discord.Intents.none())
+        self._fake_user = types.SimpleNamespace(
+            id=next(_ids),
+            name="DAVE",
+            display_avatar=types.SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png"),
+        )
+        self._fake_latency = gateway_latency
+
+    @property
+    def user(self):
+        return self._fake_user
+
+    @property
+    def latency(self) -> float:
+        return self._fake_latency
+
+class FakeVoiceChannel:
+    def __init__(self, bot: FakeBot, guild: "FakeGuild"):
+        self.id = next(_ids)
+        self.name = "General"
+        self.bot = bot
+        self.guild = guild
+
+    async def connect(self, *, cls=wavelink.Player, **kwargs) -> wavelink.Player:
+        # Stand in for the voice handshake the gateway would normally do.
+        player = cls(self.bot, self)
+        player._guild = self.guild
+        player._connected = True
+        self.guild.voice_client = player
+        return player
+
+class FakeGuild:
+    def __init__(self, bot: FakeBot):
+        self.id = next(_ids)
+        self.name = f"Guild {self.id}"
+        self.shard_id = 0
+        self.voice_client = None
+        self.voice_channel = FakeVoiceChannel(bot, self)
+        self.text_channel = types.SimpleNamespace(id=next(_ids), name="music")
+
+    def get_channel(self, channel_id: int):
+        return self.voice_channel if channel_id == self.voice_channel.id else None
+
+class FakeContext:
+    """The parts of discord.ApplicationContext the cogs use."""
+
+    def __init__(self, bot: FakeBot, guild: FakeGuild, command_name: str):
+        self.bot = bot
+        self.guild = guild
+        self.channel = guild.text_channel
+        self.author = types.SimpleNamespace(
+            id=next(_ids),
+            name="listener",
+            voice=types.SimpleNamespace(channel=guild.voice_channel),
+        )
+        self.command = types.SimpleNamespace(name=command_name, qualified_name=command_name)
+        self.interaction = types.SimpleNamespace(id=next(_ids))
+        self.created = time.perf_counter()
+        self.first_response = None
+        self.responses = []
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def respond(self, content=None, **kwargs):
+        if self.first_response is None:
+            self.first_response = time.perf_counter() - self.created
+        self.responses.append(content if content is not None else kwargs)
+
+    async def edit(self, content=None, **kwargs):
+        self.responses.append(content if content is not None else kwargs)
+
+    async def defer(self, **kwargs):
+        if self.first_response is None:
+            self.first_response = time.perf_counter() - self.created
+
+class Harness:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+        self.cogs = {
+            "play": PlayCog(bot),
+            "queue": QueueCog(bot),
+            "skip": SkipCog(bot),
+            "stop": StopCog(bot),
+            "volume": VolumeCog(bot),
+            "ping": Ping(bot),
+            "info": Info(bot),
+        }
+        self.latencies: dict[str, list[float]] = {name: [] for name in self.cogs}
+        # Commands turned away by the per-guild rate limit; their latency isn't counted.
+        self.rejected: dict[str, int] = {name: 0 for name in self.cogs}
+        self.errors = 0
+
+    async def invoke(self, guild: FakeGuild, name: str, *args) -> FakeContext:
+        cog = self.cogs[name]
+        ctx = FakeContext(self.bot, guild, name)
+        start = time.perf_counter()
+        try:
+            await getattr(cog, name).callback(cog, ctx, *args)
+        except Exception:
+            self.errors += 1
+        elapsed = time.perf_counter() - start
+        if responses.RATE_LIMITED in ctx.responses:
+            self.rejected[name] += 1
+        else:
+            self.latencies[name].append(elapsed)
+        return ctx
+
+    async def fill(self, guild: FakeGuild, tracks: int, popular: int) -> None:
+        for index in range(tracks):
+            # Part of the traffic asks for the same popular songs in every guild.
+            query = f"popular song {index}" if index < popular else f"song {guild.id} {index}"
+            await self.invoke(guild, "play", query)
+
+    async def mixed(self, guild: FakeGuild) -> None:
+        await self.invoke(guild, "queue")
+        await self.invoke(guild, "volume", 80)
+        await self.invoke(guild, "skip")
+        await self.invoke(guild, "ping")
+        await self.invoke(guild, "info")
+        await self.invoke(guild, "stop")
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+async def run(args: argparse.Namespace) -> None:
+    stub = StubLavalink(latency=args.latency / 1000)
+    await stub.start()
+    bot = FakeBot(gateway_latency=0.042)
+    bot.config = {"LAVALINK": {"LAVALINK_HOST": f"http://{stub.host}", "LAVALINK_PORT": stub.port}}
+    await wavelink.Pool.connect(nodes=[wavelink.Node(uri=stub.uri, password="stub")], client=bot)
+    metrics.enabled = True
+    if not args.rate_limit:
+        # Each simulated guild sends its commands back to back, far faster than any real one.
+        guild_scheduler.configure({"RATE": float("inf"), "BURST": 1 << 30})
+
+    harness = Harness(bot)
+    guilds = [FakeGuild(bot) for _ in range(args.guilds)]
+
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(harness.fill(guild, args.tracks, args.popular) for guild in guilds))
+    fill_elapsed = time.perf_counter() - start
+    per_player = compacted_per_player = None
+    if args.memory:
+        per_player = tracemalloc.get_traced_memory()[0] / len(guilds)
+        # Compact every queue as the idle policy would, then measure again.
+        for guild in guilds:
+            if guild.voice_client is not None:
+                guild.voice_client.compact()
+        compacted_per_player = tracemalloc.get_traced_memory()[0] / len(guilds)
+        tracemalloc.stop()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(harness.mixed(guild) for guild in guilds))
+    elapsed = fill_elapsed + time.perf_counter() - start
+
+    total = sum(len(samples) for samples in harness.latencies.values())
+    rejected = sum(harness.rejected.values())
+    print(f"{args.guilds} guilds, {args.tracks} tracks each, {args.latency}ms Lavalink latency, "
+          f"rate limit {'on' if args.rate_limit else 'off'}")
+    print(f"{total} commands in {elapsed:.2f}s: {total / elapsed:.0f} commands/s, {harness.errors} errors, "
+          f"{rejected} rate limited")
+    print(f"{'command':<10}{'count':>7}{'limited':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, samples in harness.latencies.items():
+        print(f"{name:<10}{len(samples):>7}{harness.rejected[name]:>9}" + "".join(
+            f"{percentile(samples, q) * 1000:>8.1f}ms" for q in (0.5, 0.95, 0.99)
+        ))
+    print(f"stages: {metrics.summary()['stages']}")
+    print(f"stub Lavalink requests: {dict(stub.requests)}")
+    print(f"search cache: {track_cache.stats()}")
+    if per_player is not None:
+        print(f"memory per player with {args.tracks} tracks: {per_player / 1024:.1f}KiB, "
+              f"{compacted_per_player / 1024:.1f}KiB with compacted queues")
+
+    await wavelink.Pool.close()
+    await stub.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=100, help="number of simulated guilds")
+    parser.add_argument("--tracks", type=int, default=10, help="tracks each guild plays/queues")
+    parser.add_argument("--popular", type=int, default=3, help="tracks per guild drawn from a shared popular set")
+    parser.add_argument("--latency", type=float, default=20, help="stub Lavalink latency per REST call in ms")
+    parser.add_argument("--memory", action="store_true", help="trace allocations to report memory per player")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep the default per-guild command rate limit (rejections are reported separately)")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,52 @@
+"""
+Measure how long a log call blocks the asyncio event loop in the synchronous
+and queue-based logging modes.
+
+Usage: python -m benchmarks.bench_logging [iterations]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from utils import discord_logger
+
+async def measure(iterations: int) -> float:
+    extra = {"user_id": 1, "guild_id": 2, "channel_id": 3, "command": "play"}
+    start = time.perf_counter()
+    for i in range(iterations):
+        logging.info(f"Command 'play' invoked. {i}", extra=extra)
+        if i % 100 == 0:
+            # Give the loop a chance to run like it would between commands.
+            await asyncio.sleep(0)
+    return (time.perf_counter() - start) / iterations
+
+def run(async_mode: bool, iterations: int, log_dir: str) -> dict:
+    log_file = os.path.join(log_dir, f"bench-{'async' if async_mode else 'sync'}.log")
+    # Keep the console quiet so we measure the handlers, not the terminal.
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        discord_logger.setup_logging(log_file, async_mode=async_mode, max_queue_size=iterations)
+        per_call = asyncio.run(measure(iterations))
+        handler = discord_logger.get_queue_handler()
+        stats = handler.stats() if handler else {}
+        flush_start = time.perf_counter()
+        for h in logging.getLogger().handlers:
+            h.close()
+        flush = time.perf_counter() - flush_start
+        logging.getLogger().handlers.clear()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return {"per_call_us": per_call * 1e6, "flush_ms": flush * 1e3, **stats}
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as log_dir:
+        for async_mode in (False, True):
+            result = run(async_mode, iterations, log_dir)
+            mode = "async" if async_mode else "sync"
+            print(f"{mode:>5}: {result['per_call_us']:.2f}us per log call on the loop, "
+                  f"flush {result['flush_ms']:.1f}ms, dropped {result.get('dropped', 0)}")
@@ -0,0 +1,101 @@
+"""
+Measure how long it takes to persist and load the player state of many guilds,
+to write a round of position updates, and to restore every saved player
+against a stub Lavalink node (see stub_lavalink.py) the way a restart would.
+
+Usage: python -m benchmarks.bench_player_store [guilds] [tracks_per_guild] [latency_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import wavelink
+from benchmarks.bench_commands import FakeBot, FakeGuild
+from benchmarks.stub_lavalink import StubLavalink, fake_track
+from utils.player_state import PlayerStateTracker, PlayerStore
+
+class RestoreBot(FakeBot):
+    """A FakeBot that knows its guilds, so saved states can be matched to them."""
+
+    def __init__(self):
+        super().__init__(gateway_latency=0.042)
+        self.guilds_by_id: dict[int, FakeGuild] = {}
+
+    def get_guild(self, guild_id: int):
+        return self.guilds_by_id.get(guild_id)
+
+    def add_guild(self) -> FakeGuild:
+        guild = FakeGuild(self)
+        self.guilds_by_id[guild.id] = guild
+        return guild
+
+def fake_state(guild_id: int, tracks: int, channel_id: int = None) -> dict:
+    return {
+        "guild_id": guild_id,
+        "channel_id": channel_id if channel_id is not None else guild_id + 1,
+        "volume": 100,
+        "position": 42000,
+        "current": fake_track(str(guild_id), 0),
+        "queue": [fake_track(str(guild_id), index) for index in range(1, tracks)],
+        "updated_at": time.time(),
+    }
+
+def position_update(state: dict) -> dict:
+    return {"guild_id": state["guild_id"], "volume": state["volume"], "position": state["position"] + 5000,
+            "updated_at": time.time()}
+
+async def restore(path: str, bot: RestoreBot, latency: float) -> tuple[int, float]:
+    stub = StubLavalink(latency=latency)
+    await stub.start()
+    try:
+        await wavelink.Pool.connect(nodes=[wavelink.Node(uri=stub.uri, password="stub")], client=bot)
+        tracker = PlayerStateTracker()
+        await tracker.open(path)
+        start = time.perf_counter()
+        restored = await tracker.restore_all(bot)
+        elapsed = time.perf_counter() - start
+        tracker.store.close()
+        return restored, elapsed
+    finally:
+        await wavelink.Pool.close()
+        await stub.stop()
+
+if __name__ == "__main__":
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tracks = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+    bot = RestoreBot()
+    states = []
+    for _ in range(guilds):
+        guild = bot.add_guild()
+        states.append(fake_state(guild.id, tracks, guild.voice_channel.id))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "players.db")
+        store = PlayerStore(path)
+
+        start = time.perf_counter()
+        store.save(states)
+        save = time.perf_counter() - start
+
+        positions = [position_update(state) for state in states]
+        start = time.perf_counter()
+        store.update_positions(positions)
+        update = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = store.load_all()
+        load = time.perf_counter() - start
+
+        size = os.path.getsize(path)
+        store.close()
+
+        restored, restore_elapsed = asyncio.run(restore(path, bot, latency))
+
+    print(f"{guilds} guilds x {tracks} tracks: save {save * 1000:.0f}ms, "
+          f"position update {update * 1000:.0f}ms, "
+          f"load {load * 1000:.0f}ms ({load / len(loaded) * 1e6:.0f}us per guild), "
+          f"database {size / 1024 / 1024:.1f}MiB")
+    print(f"restore_all: {restored}/{guilds} players in {restore_elapsed:.2f}s "
+          f"({restore_elapsed / max(restored, 1) * 1000:.2f}ms per player) at {latency * 1000:.0f}ms Lavalink latency")
@@ -0,0 +1,82 @@
+"""
+Compare building the /info embed from scratch on every call with rendering
+it from the pre-rendered per-guild fields in utils/responses.py.
+
+Each variant builds the embed and serializes it the way sending it would,
+for guilds that are each asked several times. Reports the CPU time and the
+memory allocated per command.
+
+Usage: python -m benchmarks.bench_responses [iterations] [guilds]
+"""
+import itertools
+import sys
+import time
+import tracemalloc
+import types
+import discord
+from utils.responses import InfoEmbeds
+
+_ids = itertools.count(10**17)
+
+def build_from_scratch(bot, guild, author, latency: float) -> discord.Embed:
+    """The embed as /info built it before the pre-rendered fields."""
+    embed = discord.Embed(title="Bot Information", color=0x7289DA)
+    embed.set_thumbnail(url=bot.user.avatar.url)
+    embed.add_field(name="Bot Name", value=bot.user.name, inline=True)
+    embed.add_field(name="Bot ID", value=bot.user.id, inline=True)
+    embed.add_field(name="Bot Latency", value=f"{round(latency * 1000)}ms", inline=True)
+    embed.add_field(name="Server Name", value=guild.name, inline=True)
+    embed.add_field(name="Server ID", value=guild.id, inline=True)
+    embed.add_field(name="User Name", value=author.name, inline=True)
+    embed.add_field(name="User ID", value=author.id, inline=True)
+    return embed
+
+def make_bot():
+    # A real ClientUser, so avatar URLs are built the way they are in production.
+    user = discord.ClientUser(state=None, data={
+        "id": str(next(_ids)), "username": "DAVE", "discriminator": "0", "avatar": "a" * 32,
+        "global_name": None, "bot": True,
+    })
+    return types.SimpleNamespace(user=user)
+
+def commands(iterations: int, guild_count: int) -> list[tuple]:
+    guilds = [types.SimpleNamespace(id=next(_ids), name=f"Guild {index}") for index in range(guild_count)]
+    authors = [types.SimpleNamespace(id=next(_ids), name=f"listener{index}") for index in range(50)]
+    return [(guilds[i % guild_count], authors[i % len(authors)], 0.042 + (i % 7) / 1000) for i in range(iterations)]
+
+def measure(render, calls: list[tuple]) -> dict:
+    start = time.perf_counter()
+    for guild, author, latency in calls:
+        render(guild, author, latency).to_dict()
+    elapsed = time.perf_counter() - start
+
+    # Allocations of one command, including what is freed again once it is sent.
+    sample = calls[:1000]
+    tracemalloc.start()
+    allocated = 0
+    for guild, author, latency in sample:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        render(guild, author, latency).to_dict()
+        allocated += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return {"us_per_call": elapsed / len(calls) * 1e6, "peak_bytes_per_call": allocated / len(sample)}
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    guild_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    bot = make_bot()
+    calls = commands(iterations, guild_count)
+    embeds = InfoEmbeds()
+
+    results = {
+        "from scratch": measure(lambda guild, author, latency: build_from_scratch(bot, guild, author, latency), calls),
+        "pre-rendered": measure(lambda guild, author, latency: embeds.render(bot, guild, author, latency), calls),
+    }
+    print(f"/info embed, {iterations} commands over {guild_count} guilds")
+    for name, result in results.items():
+        print(f"{name:<14}{result['us_per_call']:>8.2f}us per command{result['peak_bytes_per_call']:>10.0f} bytes peak per command")
+    baseline, cached = results["from scratch"], results["pre-rendered"]
+    print(f"saved {baseline['us_per_call'] - cached['us_per_call']:.2f}us and "
+          f"{baseline['peak_bytes_per_call'] - cached['peak_bytes_per_call']:.0f} bytes per command; "
+          f"cache {embeds.stats()}")
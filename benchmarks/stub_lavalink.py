@@ -0,0 +1,175 @@
+"""
+A minimal in-process Lavalink v4 server for offline benchmarks.
+
+It implements just enough of the protocol for wavelink to connect a node,
+search for tracks, update players and fetch stats, and it sleeps for a
+configurable latency before answering every REST call.
+"""
+import asyncio
+import base64
+import collections
+import socket
+from aiohttp import web
+
+def fake_track(key: str, index: int = 0) -> dict:
+    """A track payload shaped like the ones Lavalink returns."""
+    identifier = f"{key}-{index}"
+    return {
+        "encoded": base64.b64encode(f"stub:{identifier}".encode("utf-8")).decode("ascii"),
+        "info": {
+            "identifier": identifier,
+            "isSeekable": True,
+            "author": f"Artist {index % 50}",
+            "length": 180000 + index,
+            "isStream": False,
+            "position": 0,
+            "title": f"Track {index} for {key}",
+            "uri": f"https://soundcloud.com/artist/{identifier}",
+            "artworkUrl": None,
+            "isrc": None,
+            "sourceName": "soundcloud",
+        },
+        "pluginInfo": {},
+        "userData": {},
+    }
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+class StubLavalink:
+    """
+    Serves the Lavalink endpoints wavelink uses, with `latency` seconds of
+    delay on every REST call. Queries containing "playlist" resolve to a
+    playlist of `playlist_size` tracks, queries containing "missing" to nothing.
+    While `failing` is set, REST calls answer 503 but the websocket stays open,
+    like a Lavalink that hangs without dropping its connections.
+    """
+
+    def __init__(self, latency: float = 0.0, playlist_size: int = 50, host: str = "127.0.0.1", port: int = None):
+        self.latency = latency
+        self.playlist_size = playlist_size
+        self.host = host
+        self.port = port or free_port(host)
+        self.session_id = f"stub-{self.port}"
+        self.requests: collections.Counter = collections.Counter()
+        self.failing = False
+        self.players: dict[str, dict] = {}
+        self._sockets: list[web.WebSocketResponse] = []
+        self._runner = None
+
+    @property
+    def uri(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/v4/websocket", self.websocket)
+        app.router.add_get("/v4/loadtracks", self.load_tracks)
+        app.router.add_get("/v4/stats", self.stats)
+        app.router.add_get("/v4/info", self.info)
+        app.router.add_get("/version", self.version)
+        app.router.add_patch("/v4/sessions/{session}/players/{guild}", self.update_player)
+        app.router.add_delete("/v4/sessions/{session}/players/{guild}", self.destroy_player)
+        app.router.add_patch("/v4/sessions/{session}", self.update_session)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        return self.uri
+
+    async def stop(self) -> None:
+        """Stop serving; connected nodes see their websocket close."""
+        for ws in self._sockets:
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _delay(self, route: str) -> None:
+        self.requests[route] += 1
+        if self.failing:
+            raise web.HTTPServiceUnavailable()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets.append(ws)
+        await ws.send_json({"op": "ready", "resumed": False, "sessionId": self.session_id})
+        async for _ in ws:
+            pass
+        return ws
+
+    async def load_tracks(self, request: web.Request) -> web.Response:
+        await self._delay("loadtracks")
+        identifier = request.query.get("identifier", "")
+        query = identifier.split(":", 1)[-1]
+        if "missing" in query:
+            return web.json_response({"loadType": "empty", "data": {}})
+        if "playlist" in query:
+            return web.json_response({
+                "loadType": "playlist",
+                "data": {
+                    "info": {"name": query, "selectedTrack": -1},
+                    "pluginInfo": {},
+                    "tracks": [fake_track(query, index) for index in range(self.playlist_size)],
+                },
+            })
+        return web.json_response({"loadType": "search", "data": [fake_track(query)]})
+
+    async def update_player(self, request: web.Request) -> web.Response:
+        await self._delay("update_player")
+        guild = request.match_info["guild"]
+        data = await request.json()
+        player = self.players.setdefault(guild, {
+            "guildId": guild,
+            "track": None,
+            "volume": 100,
+            "paused": False,
+            "state": {"time": 0, "position": 0, "connected": True, "ping": 0},
+            "voice": {"token": "", "endpoint": "", "sessionId": ""},
+            "filters": {},
+        })
+        if "volume" in data:
+            player["volume"] = data["volume"]
+        if "filters" in data:
+            player["filters"] = data["filters"]
+        if "track" in data:
+            player["track"] = data["track"]
+        return web.json_response(player)
+
+    async def destroy_player(self, request: web.Request) -> web.Response:
+        await self._delay("destroy_player")
+        self.players.pop(request.match_info["guild"], None)
+        return web.Response(status=204)
+
+    async def update_session(self, request: web.Request) -> web.Response:
+        await self._delay("update_session")
+        return web.json_response({"resuming": False, "timeout": 60})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        await self._delay("stats")
+        return web.json_response({
+            "players": len(self.players),
+            "playingPlayers": sum(1 for player in self.players.values() if player["track"]),
+            "uptime": 0,
+            "memory": {"free": 0, "used": 0, "allocated": 0, "reservable": 0},
+            "cpu": {"cores": 1, "systemLoad": 0.0, "lavalinkLoad": 0.0},
+            "frameStats": None,
+        })
+
+    async def info(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "version": {"semver": "4.0.8", "major": 4, "minor": 0, "patch": 8, "preRelease": None, "build": None},
+            "buildTime": 0,
+            "git": {"branch": "stub", "commit": "stub", "commitTime": 0},
+            "jvm": "stub",
+            "lavaplayer": "stub",
+            "sourceManagers": ["soundcloud", "http"],
+            "filters": [],
+            "plugins": [],
+        })
+
+    async def version(self, request: web.Request) -> web.Response:
+        return web.Response(text="4.0.8")
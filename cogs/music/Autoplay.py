@@ -0,0 +1,29 @@
+import discord
+from discord.ext import commands
+from utils.discord_logger import log_command_invocation, log_error
+from utils import responses
+from utils.autoplay import autoplay
+
+class AutoplayCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @discord.slash_command(name="autoplay", description="Keep playing similar tracks when the queue runs out.")
+    async def toggle_autoplay(self, ctx: discord.ApplicationContext):
+        """
+        Toggles autoplay for this server. When the queue runs out, DAVE plays
+        tracks similar to what was queued before, by artist, title and which
+        tracks are often queued together.
+        """
+        log_command_invocation(ctx, "autoplay")
+        try:
+            if autoplay.toggle(ctx.guild.id):
+                await ctx.respond(responses.AUTOPLAY_ON)
+            else:
+                await ctx.respond(responses.AUTOPLAY_OFF)
+        except Exception as e:
+            log_error(f"An error occurred in the 'autoplay' command: {e}", ctx)
+            await ctx.respond(responses.COMMAND_FAILED)
+
+def setup(bot: commands.Bot):
+    bot.add_cog(AutoplayCog(bot))
@@ -0,0 +1,45 @@
+import discord
+from discord.ext import commands
+import wavelink
+from utils.discord_logger import log_command_invocation, log_error
+from utils import responses
+from utils.interactions import deferred, respond
+from utils.metrics import metrics
+from utils.guild_scheduler import guild_scheduler
+from utils.effects import PRESETS, guild_effects
+
+class EffectsCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @discord.slash_command(name="effects", description="Apply an audio effect preset, speed or pitch.")
+    @deferred(rate_limit=True)
+    async def effects(
+        self,
+        ctx: discord.ApplicationContext,
+        preset: discord.Option(str, description="Effect preset", choices=list(PRESETS)),
+        speed: discord.Option(float, description="Playback speed (0.5-2.0)", min_value=0.5, max_value=2.0, required=False),
+        pitch: discord.Option(float, description="Pitch (0.5-2.0)", min_value=0.5, max_value=2.0, required=False),
+    ):
+        """
+        Applies an effect preset (nightcore, bassboost, 8d, karaoke, or off),
+        optionally with a custom speed and pitch. The effects stay on for the
+        following tracks until changed.
+        """
+        log_command_invocation(ctx, "effects")
+        try:
+            vc: wavelink.Player = ctx.voice_client
+            if not vc:
+                return await respond(ctx, responses.NOT_CONNECTED)
+
+            filters = guild_effects.set(ctx.guild.id, preset, speed, pitch)
+            # Merged with any pending /volume change into a single player update.
+            with metrics.timer("effects.update_player"):
+                await guild_scheduler.update_player(vc, filters=filters)
+            await respond(ctx, responses.EFFECTS_SET.format(guild_effects.describe(ctx.guild.id)))
+        except Exception as e:
+            log_error(f"An error occurred in the 'effects' command: {e}", ctx)
+            await respond(ctx, responses.COMMAND_FAILED)
+
+def setup(bot: commands.Bot):
+    bot.add_cog(EffectsCog(bot))
@@ -1,45 +1,110 @@
 import typing
+import logging
 import discord
 from discord.ext import commands
 import wavelink
 import asyncio
 from utils.discord_logger import log_command_invocation, log_error
+from utils import responses
+from utils.interactions import deferred, respond, edit
+from utils.search_cache import track_cache
+from utils.lavalink_manager import BalancedPlayer, best_node
+from utils.prefetch import mark_resolved, track_prefetcher
+from utils.player_state import player_state
+from utils.metrics import metrics
+from utils.guild_scheduler import guild_scheduler
+from utils.track_index import track_index, autocomplete_tracks
+from utils.idle_policy import idle_policy
+from utils.effects import guild_effects
+from utils.autoplay import autoplay
+from utils.voice_sessions import voice_sessions
 
 # Helper function to connect to the user's voice channel.
 async def connect_to_voice_channel(ctx: discord.ApplicationContext) -> wavelink.Player:
     if not ctx.author.voice or not ctx.author.voice.channel:
         raise ValueError("You must be in a voice channel to use this command.")
 
-    # Use the existing voice client if available.
-    vc: wavelink.Player = typing.cast(wavelink.Player, ctx.voice_client)
-    if not vc:
-        vc = await ctx.author.voice.channel.connect(cls=wavelink.Player)
+    # Reuses the existing voice client, or moves it here if it's idle in another channel.
+    vc, created = await voice_sessions.connect(ctx.author.voice.channel, cls=BalancedPlayer)
+    vc = typing.cast(wavelink.Player, vc)
+    if created:
         vc.queue = wavelink.Queue()  # Initialize the queue immediately.
-        vc.inactive_timeout = 60  # ADDED: Set built-in inactivity timeout to 60 seconds.
+        # Inactivity timeout and idle compaction come from the IDLE config section.
+        idle_policy.apply(vc)
         # Removed manual scheduling of inactivity disconnect:
         # vc.inactive_task = asyncio.create_task(schedule_inactivity_disconnect(vc))
-    elif vc.channel.id != ctx.author.voice.channel.id:
-        raise ValueError("You must be in the same voice channel as the bot.")
-    
-    # Ensure inactive_timeout is set when reusing the voice client.
-    vc.inactive_timeout = 60
 
     return vc
 
-# Helper function to perform a search and return the first track.
-async def search_for_track(query: str) -> wavelink.Playable:
-    if query.startswith("http"):
-        songs = await wavelink.Playable.search(query)
+# How many queries of a bulk /play are resolved against Lavalink at once.
+BULK_RESOLVE_CONCURRENCY = 5
+# Upper bound on the number of queries accepted in one /play.
+MAX_BULK_QUERIES = 50
+# Minimum number of seconds between progress edits of a bulk /play response.
+PROGRESS_INTERVAL = 1.5
+
+# Helper function to perform a search and return every track it resolved to.
+# Playlist URLs return all of their tracks, searches return only the best match.
+# Queries resolved before are served from the track index, then the shared search cache.
+async def search_for_tracks(query: str) -> list[wavelink.Playable]:
+    # URLs are resolved directly, plain queries go through SoundCloud search.
+    source = None if query.startswith("http") else wavelink.TrackSource.SoundCloud
+    if source is not None:
+        track = track_index.lookup(query)
+        if track is not None:
+            mark_resolved([track])
+            return [track]
+    key = track_cache.make_key(query, source)
+
+    async def fetch():
+        node = best_node()
+        logging.info(f"Searching '{query}' on node {node.identifier}")
+        metrics.increment("lavalink_search_calls_total")
+        if source is None:
+            songs = await wavelink.Playable.search(query, node=node)
+        else:
+            songs = await wavelink.Playable.search(query, source=source, node=node)
+        mark_resolved(songs)
+        return songs
+
     try:
-        songs = await wavelink.Playable.search(query, source=wavelink.TrackSource.SoundCloud)
+        songs = await track_cache.get_or_fetch(key, fetch)
     except wavelink.LavalinkLoadException as e:
         raise RuntimeError("Failed to load tracks") from e
 
     if not songs:
-        return None
+        return []
+    if isinstance(songs, wavelink.Playlist):
+        return list(songs.tracks)
+    track_index.remember(query, songs[0])
+    return [songs[0]]
 
+# Helper function to perform a search and return the first track.
+async def search_for_track(query: str) -> wavelink.Playable:
+    songs = await search_for_tracks(query)
     # Return the first track from the search results.
-    return songs[0]
+    return songs[0] if songs else None
+
+def split_queries(search: str) -> list[str]:
+    """Split a /play argument into one query per line, or per semicolon on a single line."""
+    # Commas are part of plenty of names ("Tyler, The Creator - EARFQUAKE"), so they never split.
+    # Autocomplete choices and earlier queries are kept whole, semicolons and all.
+    if track_index.knows(search):
+        return [search.strip()]
+    lines = [line.strip() for line in search.splitlines() if line.strip()]
+    if len(lines) == 1 and not lines[0].startswith("http"):
+        lines = [part.strip() for part in lines[0].split(";") if part.strip()]
+    return lines[:MAX_BULK_QUERIES]
+
+def resolve_queries(queries: list[str]) -> list[asyncio.Task]:
+    """Start resolving every query with bounded concurrency, returning one task per query."""
+    semaphore = asyncio.Semaphore(BULK_RESOLVE_CONCURRENCY)
+
+    async def resolve(query: str) -> list[wavelink.Playable]:
+        async with semaphore:
+            return await search_for_tracks(query)
+
+    return [asyncio.create_task(resolve(query)) for query in queries]
 
 # Removed: schedule_inactivity_disconnect function is no longer needed because we use the built-in inactive_timeout.
 # async def schedule_inactivity_disconnect(player: wavelink.Player):
@@ -54,18 +119,29 @@ async def play_song(vc: wavelink.Player, song: wavelink.Playable, ctx: discord.A
         vc.inactive_task.cancel()
     if not vc.playing:
         try:
-            await vc.play(song)
-            log_command_invocation(ctx, f"Now playing: {song.title}")
+            with metrics.timer("play.vc_play"):
+                await vc.play(song)
+            metrics.increment("lavalink_player_updates_total")
+            player_state.mark_dirty(vc)
+            autoplay.record(vc.guild.id, [song])
+            log_command_invocation(ctx, f"Now playing: {song.title} on node {vc.node.identifier}")
         except Exception as e:
             log_error(ctx, f"An error occurred while playing a song", exception=e)
             log_command_invocation(ctx, f"An error occurred while playing")
     else:
         vc.queue.put(song)
+        player_state.mark_dirty(vc)
+        autoplay.record(vc.guild.id, [song])
 
 async def queue_song(vc: wavelink.Player, song: wavelink.Playable, ctx: discord.ApplicationContext) -> None:
     try:
         vc.queue.put(song)
+        player_state.mark_dirty(vc)
+        autoplay.record(vc.guild.id, [song])
         log_command_invocation(ctx, f"Added to queue: {song.title}")
+        # Validate the new track ahead of time if it will play soon.
+        if len(vc.queue) <= track_prefetcher.depth:
+            track_prefetcher.schedule(vc)
     except Exception as e:
         log_error(ctx, f"An error occurred while adding to queue", exception=e)
         log_command_invocation(ctx, f"An error occurred while adding to queue")
@@ -74,37 +150,91 @@ class PlayCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_wavelink_track_start(self, payload: wavelink.TrackStartEventPayload):
+        player: wavelink.Player = payload.player
+        if player is None:
+            return
+        track_prefetcher.finish_transition(player)
+        track_index.record_play(payload.track)
+        player_state.mark_dirty(player)
+        # Resolve the upcoming tracks while this one plays.
+        track_prefetcher.schedule(player)
+        # Lavalink keeps filters across tracks, but a player that was recreated
+        # or moved to another node may have lost the guild's effects.
+        filters = guild_effects.needs_reapply(player)
+        if filters is not None:
+            await player.set_filters(filters)
+            metrics.increment("lavalink_player_updates_total")
+
     @commands.Cog.listener()
     async def on_wavelink_track_end(self, payload: wavelink.TrackEndEventPayload):
         player: wavelink.Player = payload.player
-        # Only advance if the track ended normally and there is a queue.
-        if payload.reason.lower() == "finished" and hasattr(player, "queue") and not player.queue.is_empty:
-            next_track = player.queue.get()  # or await player.queue.get_wait() if needed
-            await player.play(next_track)
+        # Only advance if the track ended normally (or failed to load) and there is a queue,
+        # or autoplay has a recommendation ready for an empty one.
+        # The next track has already been validated by the prefetcher, so play it straight away.
+        if payload.reason.lower() in ("finished", "loadfailed") and hasattr(player, "queue") and (
+            not player.queue.is_empty or player.guild.id in autoplay.enabled
+        ):
+            # Serialized with /skip, /play and /stop so the queue never advances twice.
+            async with guild_scheduler.lock(player.guild.id):
+                if player.playing:
+                    return
+                if not player.queue.is_empty:
+                    next_track = player.queue.get()  # or await player.queue.get_wait() if needed
+                else:
+                    next_track = autoplay.next(player.guild.id)
+                    if next_track is None:
+                        return
+                track_prefetcher.start_transition(player)
+                await player.play(next_track)
+                metrics.increment("lavalink_player_updates_total")
             # Cancel any pending manual inactivity disconnect.
             if hasattr(player, "inactive_task") and not player.inactive_task.done():
                 player.inactive_task.cancel()
+        player_state.mark_dirty(player)
         # Removed manual scheduling of inactivity disconnect.
         # else:
         #     if not player.playing:
         #         player.inactive_task = asyncio.create_task(schedule_inactivity_disconnect(player))
 
+    @commands.Cog.listener()
+    async def on_wavelink_player_update(self, payload: wavelink.PlayerUpdateEventPayload):
+        # Lavalink reports positions every few seconds; only the position is written, not the queue.
+        # Idle and paused players don't move, so their (possibly compacted) state stays as saved.
+        player = payload.player
+        if player is not None and player.playing and not player.paused:
+            player_state.mark_moved(player)
+
     # ADDED: Event listener for built-in inactivity timeout.
     @commands.Cog.listener()
     async def on_wavelink_inactive_player(self, player: wavelink.Player) -> None:
         log_command_invocation(None, "Inactive timeout reached. Disconnecting from voice.")
-        await player.disconnect()
+        player_state.forget(player.guild.id)
+        guild_scheduler.forget(player.guild.id)
+        idle_policy.forget(player.guild.id)
+        guild_effects.forget(player.guild.id)
+        autoplay.forget(player.guild.id)
+        voice_sessions.forget(player.guild.id)
+        await voice_sessions.disconnect(player)
 
     @discord.slash_command(
         name="play", 
         description="Play a song from a search query (SoundCloud by default) or enqueue it."
     )
-    async def play(self, ctx: discord.ApplicationContext, search: str):
+    @deferred(rate_limit=True)
+    async def play(
+        self,
+        ctx: discord.ApplicationContext,
+        search: discord.Option(str, description="A search query or URL", autocomplete=autocomplete_tracks)
+    ):
         """
         Searches for and plays a song based on your query.
         
-        - If you provide a URL, it plays that track directly.
+        - If you provide a URL, it plays that track directly. Playlist URLs enqueue every track.
         - If you provide a plain search query, it uses SoundCloud search (since YouTube search is disabled in your Lavalink config).
+        - Several queries can be given at once, separated by semicolons or on separate lines.
+        - Tracks played before are suggested as you type and start without a new search.
         
         If a song is already playing, the new track is added to the queue.
         """
@@ -112,19 +242,94 @@ class PlayCog(commands.Cog):
 
         try:
             # Use the helper to connect to the voice channel.
-            vc = await connect_to_voice_channel(ctx)
+            with metrics.timer("play.voice_connect"):
+                vc = await connect_to_voice_channel(ctx)
+            queries = split_queries(search)
+            if len(queries) > 1 or search.startswith("http"):
+                return await self.play_many(ctx, vc, queries)
+
             # Use the helper to search for a track.
-            song = await search_for_track(search)
-
-            if not vc.playing:
-                await play_song(vc, song, ctx)
-                await ctx.respond(f"Now playing: `{song.title}`")
-            else:
-                await queue_song(vc, song, ctx)
-                await ctx.respond(f"Added to queue: `{song.title}`")
+            with metrics.timer("play.search"):
+                song = await search_for_track(search)
+            if song is None:
+                return await respond(ctx, responses.NO_RESULTS.format(search))
+
+            # Two concurrent /play calls must not both see an idle player and replace each other.
+            async with guild_scheduler.lock(ctx.guild.id):
+                if not vc.playing:
+                    await play_song(vc, song, ctx)
+                    message = responses.NOW_PLAYING.format(song.title)
+                else:
+                    await queue_song(vc, song, ctx)
+                    message = responses.ADDED_TO_QUEUE.format(song.title)
+            with metrics.timer("play.respond"):
+                await respond(ctx, message)
         except Exception as e:
             log_error(ctx, "An error occurred in 'play' command", exception=e)
-            await ctx.respond("An error occurred while processing your request.")
+            await respond(ctx, responses.COMMAND_FAILED)
+
+    async def play_many(self, ctx: discord.ApplicationContext, vc: wavelink.Player, queries: list[str]):
+        """
+        Resolve several queries (or a playlist URL) concurrently and enqueue them as one batch.
+        Playback starts as soon as any query resolves, the rest is queued in the order given,
+        and the response is edited with progress.
+        """
+        await respond(ctx, f"Resolving {len(queries)} {'query' if len(queries) == 1 else 'queries'}...")
+        tasks = resolve_queries(queries)
+        positions = {task: position for position, task in enumerate(tasks)}
+        resolved: list[list[wavelink.Playable]] = [[] for _ in tasks]
+
+        loop = asyncio.get_running_loop()
+        last_update = loop.time()
+        now_playing = None
+        failed = done = ready = 0
+
+        remaining = set(tasks)
+        while remaining:
+            finished, remaining = await asyncio.wait(remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                position = positions[task]
+                done += 1
+                try:
+                    tracks = task.result()
+                except Exception as e:
+                    log_error(f"Failed to resolve '{queries[position]}': {e}", ctx)
+                    tracks = []
+                if not tracks:
+                    failed += 1
+
+                # Start playback with whichever track arrives first, queue everything else.
+                if tracks and now_playing is None and not vc.playing:
+                    async with guild_scheduler.lock(ctx.guild.id):
+                        if not vc.playing:
+                            now_playing = tracks[0]
+                            await play_song(vc, now_playing, ctx)
+                            tracks = tracks[1:]
+                resolved[position] = tracks
+                ready += len(tracks)
+
+            if loop.time() - last_update >= PROGRESS_INTERVAL and remaining:
+                last_update = loop.time()
+                await edit(ctx, content=f"Resolved {done}/{len(tasks)} queries, {ready} tracks ready...")
+
+        pending = [track for tracks in resolved for track in tracks]
+
+        if pending:
+            vc.queue.put(pending)
+            player_state.mark_dirty(vc)
+            autoplay.record(vc.guild.id, pending)
+            log_command_invocation(ctx, f"Added {len(pending)} tracks to queue")
+            track_prefetcher.schedule(vc)
+
+        lines = []
+        if now_playing is not None:
+            lines.append(responses.NOW_PLAYING.format(now_playing.title))
+        if pending or now_playing is None:
+            lines.append(f"Added {len(pending)} {'track' if len(pending) == 1 else 'tracks'} to the queue.")
+        message = "\n".join(lines)
+        if failed:
+            message += f" {failed} {'query' if failed == 1 else 'queries'} found nothing."
+        await edit(ctx, content=message)
 
 def setup(bot: commands.Bot):
     bot.add_cog(PlayCog(bot))
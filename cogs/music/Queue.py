@@ -1,11 +1,152 @@
+import itertools
 import discord
 from discord.ext import commands
 import wavelink
 from utils.discord_logger import log_command_invocation, log_error
+from utils import responses
+
+# Number of queued tracks shown per page.
+PAGE_SIZE = 10
+# Long titles are cut so a full page always fits in one Discord message.
+MAX_TITLE_LENGTH = 80
+
+def format_duration(milliseconds: int) -> str:
+    seconds = int(milliseconds // 1000)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes}:{seconds:02}"
+
+def format_title(track: wavelink.Playable) -> str:
+    title = track.title
+    if len(title) > MAX_TITLE_LENGTH:
+        title = title[:MAX_TITLE_LENGTH - 1] + "…"
+    return title
+
+def queue_signature(vc: wavelink.Player) -> tuple:
+    """A cheap fingerprint of the queue that changes whenever tracks are added, played, moved or removed."""
+    queue = vc.queue
+    version = getattr(queue, "version", None)
+    if version is not None:
+        # BalancedPlayer queues count every change.
+        return (id(queue), version)
+    # Plain wavelink queues: length and ends only, which misses changes in the middle.
+    if queue.is_empty:
+        return (0,)
+    return (len(queue), id(queue.peek(0)), id(queue.peek(len(queue) - 1)))
+
+class QueuePages:
+    """
+    Renders pages of one guild's queue. Rendered pages are cached until the
+    queue's signature changes, and each page only walks its own slice.
+    """
+
+    def __init__(self):
+        self.signature = None
+        self.pages: dict[int, str] = {}
+        # ETA offset at the start of each page, filled in lazily.
+        self.page_offsets: dict[int, int] = {0: 0}
+
+    def page_count(self, vc: wavelink.Player) -> int:
+        return max(1, -(-len(vc.queue) // PAGE_SIZE))
+
+    def _offset_at(self, vc: wavelink.Player, page: int):
+        """Total length of every track before the given page, or None after a live stream."""
+        known = max(p for p in self.page_offsets if p <= page)
+        offset = self.page_offsets[known]
+        start = known * PAGE_SIZE
+        for track in itertools.islice(vc.queue, start, page * PAGE_SIZE):
+            if offset is None or track.is_stream:
+                offset = None
+                break
+            offset += track.length
+        self.page_offsets[page] = offset
+        return offset
+
+    def render(self, vc: wavelink.Player, page: int) -> str:
+        signature = queue_signature(vc)
+        if signature != self.signature:
+            self.signature = signature
+            self.pages.clear()
+            self.page_offsets = {0: 0}
+
+        body = self.pages.get(page)
+        if body is None:
+            body = self._render_page(vc, page)
+            self.pages[page] = body
+        return self._render_header(vc) + body
+
+    def _render_header(self, vc: wavelink.Player) -> str:
+        # The header changes as the current track plays, so it is never cached.
+        if not vc.current:
+            return "**Currently Playing:** Nothing\n\n"
+        if vc.current.is_stream:
+            return f"**Currently Playing:** {format_title(vc.current)} (live)\n\n"
+        remaining = max(0, vc.current.length - vc.position)
+        return f"**Currently Playing:** {format_title(vc.current)} ({format_duration(remaining)} left)\n\n"
+
+    def _render_page(self, vc: wavelink.Player, page: int) -> str:
+        if vc.queue.is_empty:
+            return "The queue is empty."
+
+        offset = self._offset_at(vc, page)
+        start = page * PAGE_SIZE
+        lines = [f"**Current Queue** (page {page + 1}/{self.page_count(vc)}, {len(vc.queue)} tracks):"]
+        for idx, track in enumerate(itertools.islice(vc.queue, start, start + PAGE_SIZE), start=start + 1):
+            if track.is_stream:
+                lines.append(f"{idx}. {format_title(track)} [live]")
+                offset = None
+                continue
+            # ETAs are relative to the end of the current track so cached pages stay valid while it plays.
+            eta = f"starts in +{format_duration(offset)}" if offset is not None else "after a live stream"
+            lines.append(f"{idx}. {format_title(track)} [{format_duration(track.length)}] ({eta})")
+            if offset is not None:
+                offset += track.length
+        if page + 1 not in self.page_offsets:
+            self.page_offsets[page + 1] = offset
+        return "\n".join(lines)
+
+class QueueView(discord.ui.View):
+    """Previous/next buttons for paging through the queue."""
+
+    def __init__(self, cog: "QueueCog", guild_id: int):
+        super().__init__(timeout=120)
+        self.cog = cog
+        self.guild_id = guild_id
+        self.page = 0
+
+    async def show(self, interaction: discord.Interaction, step: int):
+        vc: wavelink.Player = interaction.guild.voice_client if interaction.guild else None
+        if not vc or not hasattr(vc, "queue"):
+            return await interaction.response.edit_message(content=responses.NOT_CONNECTED, view=None)
+        pages = self.cog.get_pages(self.guild_id)
+        self.page = min(max(0, self.page + step), pages.page_count(vc) - 1)
+        await interaction.response.edit_message(content=pages.render(vc, self.page), view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self.show(interaction, -1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self.show(interaction, 1)
 
 class QueueCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.pages: dict[int, QueuePages] = {}
+
+    def get_pages(self, guild_id: int) -> QueuePages:
+        pages = self.pages.get(guild_id)
+        if pages is None:
+            pages = self.pages[guild_id] = QueuePages()
+        return pages
+
+    @commands.Cog.listener()
+    async def on_wavelink_inactive_player(self, player: wavelink.Player) -> None:
+        if player.guild:
+            self.pages.pop(player.guild.id, None)
 
     @discord.slash_command(name="queue", description="Display the current song queue and what is currently playing.")
     async def queue(self, ctx: discord.ApplicationContext):
@@ -13,29 +154,21 @@ class QueueCog(commands.Cog):
         try:
             vc: wavelink.Player = ctx.voice_client
             if not vc:
-                return await ctx.respond("I'm not connected to a voice channel.")
+                return await ctx.respond(responses.NOT_CONNECTED)
 
-            message = ""
+            if not hasattr(vc, "queue"):
+                return await ctx.respond(responses.NOTHING_QUEUED)
 
-            # Show the currently playing track if available.
-            if vc.current:
-                message += f"**Currently Playing:** {vc.current.title}\n\n"
+            pages = self.get_pages(ctx.guild.id)
+            message = pages.render(vc, 0)
+            # Only attach the buttons when there is more than one page.
+            if pages.page_count(vc) > 1:
+                await ctx.respond(message, view=QueueView(self, ctx.guild.id))
             else:
-                message += "**Currently Playing:** Nothing\n\n"
-
-            # Then show the rest of the queue.
-            if not hasattr(vc, "queue") or vc.queue.is_empty:
-                message += "The queue is empty."
-            else:
-                message += "**Current Queue:**\n"
-                queue_list = list(vc.queue)
-                for idx, track in enumerate(queue_list, start=1):
-                    message += f"{idx}. {track.title}\n"
-
-            await ctx.respond(message)
+                await ctx.respond(message)
         except Exception as e:
             log_error(ctx, "An error occurred in 'queue' command", exception=e)
-            await ctx.respond("An error occurred while processing your request.")
+            await ctx.respond(responses.COMMAND_FAILED)
 
 def setup(bot: commands.Bot):
     bot.add_cog(QueueCog(bot))
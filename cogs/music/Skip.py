@@ -2,35 +2,44 @@ import discord
 from discord.ext import commands
 import wavelink
 from utils.discord_logger import log_command_invocation, log_error
+from utils import responses
+from utils.interactions import deferred, respond
+from utils.player_state import player_state
+from utils.metrics import metrics
+from utils.guild_scheduler import guild_scheduler
 
 class SkipCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     @discord.slash_command(name="skip", description="Skip the currently playing track and play the next track in queue if available.")
+    @deferred(rate_limit=True)
     async def skip(self, ctx: discord.ApplicationContext):
         log_command_invocation(ctx, "skip")
         try:
             vc: wavelink.Player = ctx.voice_client
             if not vc:
-                return await ctx.respond("I'm not connected to a voice channel.")
+                return await respond(ctx, responses.NOT_CONNECTED)
 
-            # Skip the current track.
-            skipped_track = await vc.skip(force=True)
-            response_message = f"Skipped track: `{skipped_track.title}`\n"
+            if not vc.current:
+                return await respond(ctx, responses.NOTHING_PLAYING)
 
-            # If a custom queue exists and is non-empty, play the next track.
-            if hasattr(vc, "queue") and not vc.queue.is_empty:
-                next_track = vc.queue.get()  # You could also await vc.queue.get_wait() if desired.
-                await vc.play(next_track)
-                response_message += f"Now playing: `{next_track.title}`"
+            # Skip the current track and play the next one in the queue, if any.
+            # Concurrent skips in the same guild are collapsed into this one.
+            with metrics.timer("skip.vc_skip"):
+                skipped_track, next_track, collapsed = await guild_scheduler.skip(vc)
+            response_message = responses.SKIPPED.format(skipped_track.title) if skipped_track else ""
+
+            if next_track:
+                response_message += responses.NOW_PLAYING.format(next_track.title)
             else:
-                response_message += "No more tracks in queue."
+                response_message += responses.NO_MORE_TRACKS
 
-            await ctx.respond(response_message)
+            player_state.mark_dirty(vc)
+            await respond(ctx, response_message)
         except Exception as e:
             log_error(ctx, "An error occurred in the 'skip' command", exception=e)
-            await ctx.respond("An error occurred while processing your request.")
+            await respond(ctx, responses.COMMAND_FAILED)
 
 def setup(bot: commands.Bot):
     bot.add_cog(SkipCog(bot))
@@ -2,30 +2,40 @@ import discord
 from discord.ext import commands
 import wavelink
 from utils.discord_logger import log_command_invocation, log_error
+from utils import responses
+from utils.interactions import deferred, respond
+from utils.player_state import player_state
+from utils.metrics import metrics
+from utils.guild_scheduler import guild_scheduler
 
 class StopCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     @discord.slash_command(name="stop", description="Stop the current playback and clear the queue.")
+    @deferred(rate_limit=True)
     async def stop(self, ctx: discord.ApplicationContext):
         log_command_invocation(ctx, "stop")
         try:
             vc: wavelink.Player = ctx.voice_client
             if not vc:
-                return await ctx.respond("I'm not connected to a voice channel.")
+                return await respond(ctx, responses.NOT_CONNECTED)
 
             # Stop the current track (stop() is an alias to skip() with force=True)
-            stopped_track = await vc.stop(force=True)
-            
-            # Clear the queue if it exists
-            if hasattr(vc, "queue"):
-                vc.queue.clear()
+            async with guild_scheduler.lock(ctx.guild.id):
+                # Clear the queue first so a track end can't start the next track.
+                if hasattr(vc, "queue"):
+                    vc.queue.clear()
+                with metrics.timer("stop.vc_stop"):
+                    stopped_track = await vc.stop(force=True)
+                metrics.increment("lavalink_player_updates_total")
+            # Nothing left to resume after an explicit stop.
+            player_state.forget(ctx.guild.id)
 
-            await ctx.respond("Playback stopped and queue cleared.")
+            await respond(ctx, responses.PLAYBACK_STOPPED)
         except Exception as e:
             log_error(ctx, "An error occurred in 'stop' command", exception=e)
-            await ctx.respond("An error occurred while processing your request.")
+            await respond(ctx, responses.COMMAND_FAILED)
 
 def setup(bot: commands.Bot):
     bot.add_cog(StopCog(bot))
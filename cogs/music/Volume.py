@@ -2,28 +2,37 @@ import discord
 from discord.ext import commands
 import wavelink
 from utils.discord_logger import log_command_invocation, log_error
+from utils import responses
+from utils.interactions import deferred, respond
+from utils.player_state import player_state
+from utils.metrics import metrics
+from utils.guild_scheduler import guild_scheduler
 
 class VolumeCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     @discord.slash_command(name="volume", description="Set the playback volume (0-1000).")
+    @deferred(rate_limit=True)
     async def volume(self, ctx: discord.ApplicationContext, level: int):
         log_command_invocation(ctx, "volume")
         try:
             vc: wavelink.Player = ctx.voice_client
             if not vc:
-                return await ctx.respond("I'm not connected to a voice channel.")
+                return await respond(ctx, responses.NOT_CONNECTED)
             
             # Ensure the volume level is within acceptable bounds.
             if level < 0 or level > 1000:
-                return await ctx.respond("Volume must be between 0 and 1000.")
+                return await respond(ctx, responses.VOLUME_OUT_OF_RANGE)
             
-            await vc.set_volume(level)
-            await ctx.respond(f"Volume set to {level}%.")
+            # Bursts of volume changes are applied once, with the last requested level.
+            with metrics.timer("volume.set_volume"):
+                applied = await guild_scheduler.set_volume(vc, level)
+            player_state.mark_dirty(vc)
+            await respond(ctx, responses.VOLUME_SET.format(applied))
         except Exception as e:
             log_error(ctx, "An error occurred in the 'volume' command", exception=e)
-            await ctx.respond("An error occurred while processing your request.")
+            await respond(ctx, responses.COMMAND_FAILED)
 
 def setup(bot: commands.Bot):
     bot.add_cog(VolumeCog(bot))
@@ -1,25 +1,41 @@
 #Slash command that returns verbose information about the bot and the server it's running on including latency. As well as the user who invoked the command.
 import discord
 from discord.ext import commands
+from utils.responses import info_embeds
+from utils.sharding import guild_shard_latency
 
 class Info(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        info_embeds.invalidate_guild(after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        info_embeds.invalidate_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        if self.bot.user is not None and after.id == self.bot.user.id:
+            info_embeds.invalidate_bot()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Changes to the bot's own profile aren't dispatched as on_user_update;
+        # a new gateway session carries the current one.
+        info_embeds.invalidate_bot()
+
     @discord.slash_command(
         name="info",
         description="Shows information about the bot and the server it's running on."
     )
     async def info(self, ctx: discord.ApplicationContext):
-        embed = discord.Embed(title="Bot Information", color=0x7289DA)
-        embed.set_thumbnail(url=self.bot.user.avatar.url)
-        embed.add_field(name="Bot Name", value=self.bot.user.name, inline=True)
-        embed.add_field(name="Bot ID", value=self.bot.user.id, inline=True)
-        embed.add_field(name="Bot Latency", value=f"{round(self.bot.latency * 1000)}ms", inline=True)
-        embed.add_field(name="Server Name", value=ctx.guild.name, inline=True)
-        embed.add_field(name="Server ID", value=ctx.guild.id, inline=True)
-        embed.add_field(name="User Name", value=ctx.author.name, inline=True)
-        embed.add_field(name="User ID", value=ctx.author.id, inline=True)
+        shard_id, latency = guild_shard_latency(self.bot, ctx.guild)
+        shard = f"{shard_id} of {self.bot.shard_count}" if isinstance(self.bot, discord.AutoShardedBot) else None
+        # Only the latency, shard and user fields are rendered per call.
+        embed = info_embeds.render(self.bot, ctx.guild, ctx.author, latency, shard)
         await ctx.respond(embed=embed)
 
 def setup(bot: commands.Bot):
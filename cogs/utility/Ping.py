@@ -1,5 +1,7 @@
 import discord
 from discord.ext import commands
+from utils import responses
+from utils.sharding import guild_shard_latency, shard_latencies
 
 class Ping(commands.Cog):
     def __init__(self, bot):
@@ -10,7 +12,12 @@ class Ping(commands.Cog):
         description="Replies with Pong! and shows bot latency."
     )
     async def ping(self, ctx: discord.ApplicationContext):
-        await ctx.respond(f"Pong! 🏓 Latency: {round(self.bot.latency * 1000)}ms")
+        if not isinstance(self.bot, discord.AutoShardedBot):
+            return await ctx.respond(responses.PONG.format(round(self.bot.latency * 1000)))
+
+        shard_id, latency = guild_shard_latency(self.bot, ctx.guild)
+        shards = ", ".join(f"#{sid}: {round(value * 1000)}ms" for sid, value in sorted(shard_latencies(self.bot).items()))
+        await ctx.respond(responses.PONG_SHARDED.format(round(latency * 1000), shard_id, shards)[:2000])
 
 def setup(bot: commands.Bot):
     """Proper async setup function for Pycord 2.6.1"""
@@ -0,0 +1,84 @@
+import time
+import discord
+from discord.ext import commands
+from utils.discord_logger import log_command_invocation
+from utils.metrics import metrics
+from utils.search_cache import track_cache
+from utils.track_index import track_index
+from utils.idle_policy import idle_policy
+from utils.autoplay import autoplay
+from utils.voice_sessions import voice_sessions
+
+# Discord's limit on the length of a message.
+MESSAGE_LIMIT = 2000
+
+class Stats(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # Start times of in-flight commands, keyed on interaction id.
+        self._started: dict[int, float] = {}
+
+    @commands.Cog.listener()
+    async def on_application_command(self, ctx: discord.ApplicationContext):
+        if metrics.enabled:
+            self._started[ctx.interaction.id] = time.perf_counter()
+
+    @commands.Cog.listener()
+    async def on_application_command_completion(self, ctx: discord.ApplicationContext):
+        started = self._started.pop(ctx.interaction.id, None)
+        if started is not None:
+            metrics.observe(f"command.{ctx.command.qualified_name}", time.perf_counter() - started)
+
+    @commands.Cog.listener()
+    async def on_application_command_error(self, ctx: discord.ApplicationContext, error: Exception):
+        self._started.pop(ctx.interaction.id, None)
+        metrics.increment("command_errors_total")
+
+    @discord.slash_command(
+        name="stats",
+        description="Shows command latency percentiles and Lavalink call counts."
+    )
+    @discord.default_permissions(administrator=True)
+    async def stats(self, ctx: discord.ApplicationContext):
+        log_command_invocation(ctx, "stats")
+        if not metrics.enabled:
+            return await ctx.respond("Metrics are disabled. Set `METRICS.ENABLED` in the config to collect them.", ephemeral=True)
+
+        summary = metrics.summary()
+        lines = ["```", f"{'stage':<24}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}"]
+        for stage, values in summary["stages"].items():
+            lines.append(
+                f"{stage[:24]:<24}{values['count']:>8}"
+                f"{values['p50'] * 1000:>7.0f}ms{values['p95'] * 1000:>7.0f}ms{values['p99'] * 1000:>7.0f}ms"
+            )
+        lines.append("")
+        for name, value in summary["counters"].items():
+            lines.append(f"{name}: {value}")
+        cache = track_cache.stats()
+        lines.append(f"search cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%})")
+        index = track_index.stats()
+        lines.append(f"track index: {index['tracks']} tracks, {index['hits']} hits, {index['misses']} misses")
+        idle = idle_policy.stats()
+        lines.append(
+            f"players: {idle['players']} ({idle['compacted']} compacted), "
+            f"~{idle['bytes_per_player'] / 1024:.1f}KiB queued per player, RSS {idle['rss_bytes'] / 1024 / 1024:.0f}MiB"
+        )
+        recommendations = autoplay.stats()
+        lines.append(
+            f"autoplay: {recommendations['guilds']} guilds, {recommendations['candidates']} candidates, "
+            f"{recommendations['played']} played, {recommendations['empty']} with nothing ready"
+        )
+        voice = voice_sessions.stats()
+        states = ", ".join(f"{count} {state}" for state, count in sorted(voice.pop("states").items())) or "none"
+        lines.append(f"voice sessions: {states}")
+        if voice:
+            lines.append("voice events: " + ", ".join(f"{event} {count}" for event, count in sorted(voice.items())))
+        lines.append(f"gateway latency: {round(self.bot.latency * 1000)}ms")
+        # Drop whole lines from the end rather than cutting off the closing fence.
+        while len(lines) > 2 and sum(len(line) + 1 for line in lines) + len("```") > MESSAGE_LIMIT:
+            lines.pop()
+        lines.append("```")
+        await ctx.respond("\n".join(lines), ephemeral=True)
+
+def setup(bot: commands.Bot):
+    bot.add_cog(Stats(bot))
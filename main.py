@@ -1,40 +1,36 @@
 import pathlib
-import json
 import logging
 import discord
 import wavelink
 import typing
 import asyncio
 from discord.ext import commands
-from utils import discord_logger, lavalink_manager 
-
-
-
-async def load_extensions():
-    cogs_dir = pathlib.Path("cogs")
-    for path in cogs_dir.rglob("*.py"):
-        if path.stem != "__init__":
-            cog_path = ".".join(path.with_suffix("").parts)
-            try:
-                bot.load_extension(cog_path)  # Ensure we await async setup
-                logging.info(f"Loaded cog: {cog_path}")
-            except Exception as e:
-                logging.error(f"Failed to load cog {cog_path}: {e}")
-
-def load_config(file_path: str) -> dict:
-    import json
-    with open(file_path, "r", encoding="utf-8") as f:
-        config_data = json.load(f)
-    print("Loaded config:", config_data)  # Debug: inspect the config
-    if "DISCORD" not in config_data or "DISCORD_TOKEN" not in config_data["DISCORD"]:
-        raise Exception("DISCORD_TOKEN not set in configuration file.")
-    return config_data
+from utils import discord_logger, lavalink_manager, sharding, startup
+from utils.config import Config
+from utils.player_state import player_state
+from utils.track_index import track_index
+from utils.idle_policy import idle_policy
+from utils.autoplay import autoplay
+from utils.voice_sessions import voice_sessions
+from utils.metrics import metrics, start_metrics_server
+from utils.guild_scheduler import guild_scheduler
 
-# Set up logging
-discord_logger.setup_logging("logs/bot.log")
 
-# Load configuration
-config_data = load_config("data/config.json")
+# Load and validate configuration.
+# Cluster workers take the shared sections (e.g. Lavalink nodes) from the shard coordinator.
+config_data = Config.load("data/config.json", overlay=sharding.fetch_shared_config)
+
+# Set up logging
+logging_config = config_data.get("LOGGING", {})
+discord_logger.setup_logging(
+    sharding.worker_log_file("logs/bot.log"),
+    async_mode=logging_config.get("ASYNC", False),
+    max_queue_size=logging_config.get("QUEUE_SIZE", 10000),
+    max_bytes=logging_config.get("MAX_BYTES", 0),
+    backup_count=logging_config.get("BACKUP_COUNT", 5),
+    rotate_interval=logging_config.get("ROTATE_INTERVAL", 0),
+    compress=logging_config.get("COMPRESS", True)
+)
 TOKEN = config_data["DISCORD"]["DISCORD_TOKEN"]
 GUILD_IDS = config_data["DISCORD"].get("GUILD_IDS", [])
 
@@ -42,19 +38,66 @@ GUILD_IDS = config_data["DISCORD"].get("GUILD_IDS", [])
 intents = discord.Intents.default()
 intents.message_content = True
 
-# Instantiate the bot with our intents and debug_guilds for instant command registration
-bot = discord.Bot(intents=intents, debug_guilds=GUILD_IDS)
+# Instantiate the bot with our intents and debug_guilds for instant command registration.
+# Commands are synced once by the startup pipeline after every cog is loaded.
+shard_options = sharding.shard_options(config_data.get("SHARDING", {}))
+if shard_options is not None:
+    bot = discord.AutoShardedBot(intents=intents, debug_guilds=GUILD_IDS, auto_sync_commands=False, **shard_options)
+else:
+    bot = discord.Bot(intents=intents, debug_guilds=GUILD_IDS, auto_sync_commands=False)
 
 # Optionally attach config to the bot for easy access in your cogs
 bot.config = config_data
 
+startup_pipeline = startup.StartupPipeline(bot)
+
+# Latency metrics are off unless enabled in the config.
+metrics_config = config_data.get("METRICS", {})
+metrics.enabled = metrics_config.get("ENABLED", False)
+metrics.gauges["gateway_latency_seconds"] = lambda: bot.latency
+
+# Per-guild rate limits and debouncing for music commands.
+guild_scheduler.configure(config_data.get("RATE_LIMIT", {}))
+
+# Idle players are compacted and then disconnected according to the IDLE config section.
+idle_policy.configure(config_data.get("IDLE", {}))
+autoplay.configure(config_data.get("AUTOPLAY", {}))
+metrics.gauges["players_compacted"] = lambda: idle_policy.compacted_players
+metrics.gauges["player_memory_bytes"] = lambda: idle_policy.bytes_per_player
+
+def apply_idle_config(idle_config: dict):
+    idle_policy.configure(idle_config)
+    for player in bot.voice_clients:
+        if isinstance(player, wavelink.Player):
+            idle_policy.apply(player)
+
+# Voice connections are reused, moved and retried by the voice session manager.
+voice_sessions.configure(config_data.get("VOICE", {}))
+voice_sessions.register_listeners(bot, on_moved=player_state.mark_dirty)
+ready_count = 0
+
+# Sections that take effect live when data/config.json changes or on SIGHUP.
+config_data.on_reload("LAVALINK", lambda section: lavalink_manager.apply_node_configs(bot, section))
+config_data.on_reload("RATE_LIMIT", guild_scheduler.configure)
+config_data.on_reload("IDLE", apply_idle_config)
+config_data.on_reload("AUTOPLAY", autoplay.configure)
+config_data.on_reload("VOICE", voice_sessions.configure)
+config_data.on_reload("METRICS", lambda section: setattr(metrics, "enabled", section.get("ENABLED", False)))
+config_data.on_reload("TRACK_INDEX", lambda section: setattr(track_index, "max_tracks", section.get("MAX_TRACKS", track_index.max_tracks)))
+
 @bot.event
 async def on_ready():
+    global ready_count
+    ready_count += 1
     logging.info(f"{bot.user} is connected to Discord!")
     if GUILD_IDS:
         logging.info(f"Debugging guilds: {GUILD_IDS}")
     else:
         logging.info("Debugging guilds not set")
+    if ready_count > 1:
+        # A new gateway session drops voice connections; reconnect the saved
+        # players, capped and with backoff by the voice session manager.
+        bot.loop.create_task(player_state.restore_all(bot))
 
 @bot.event
 async def on_interaction(interaction: discord.Interaction):
@@ -64,15 +107,23 @@ async def on_interaction(interaction: discord.Interaction):
         channel = interaction.channel
         guild = interaction.guild
         logging.info(f"Slash command '{command_name}' invoked by {user} in {channel} of {guild}")
+        # A music command can arrive before Lavalink is ready; load its cog now.
+        if startup_pipeline.is_pending_command(command_name):
+            await startup_pipeline.load_deferred(f"first use of /{command_name}")
     await bot.process_application_commands(interaction)
 
+@bot.listen("on_wavelink_node_ready")
+async def restore_players(payload: wavelink.NodeReadyEventPayload):
+    # Bring back the queues saved before a restart or lost with a node.
+    await player_state.restore_all(bot)
+
 
 if __name__ == "__main__":
     logging.info("Starting bot...")
     logging.info(f"Guild IDs: {GUILD_IDS}")
     logging.info(f"Pycord version: {discord.__version__}")
 
-    bot.loop.create_task(load_extensions())
+    bot.loop.create_task(startup_pipeline.run())
 
     #Register the Lavalink node ready listener
     lavalink_manager.register_node_ready_listener(bot)
@@ -80,6 +131,23 @@ if __name__ == "__main__":
     # Connect to Lavalink nodes
     bot.loop.create_task(lavalink_manager.connect_nodes(bot))
 
+    # Persist player state so queues survive restarts.
+    bot.loop.create_task(player_state.run(bot))
+    bot.loop.create_task(track_index.run(bot))
+    bot.loop.create_task(idle_policy.run(bot))
+
+    if metrics.enabled and metrics_config.get("PORT"):
+        # Cluster workers serve on PORT + their cluster id.
+        metrics_port = sharding.worker_port(metrics_config["PORT"])
+        bot.loop.create_task(start_metrics_server(metrics_config.get("HOST", "127.0.0.1"), metrics_port))
+
+    # Reload the non-token config sections without restarting.
+    config_data.install_signal_handler(bot.loop)
+    bot.loop.create_task(config_data.watch())
+
+    # Cluster workers report their shard latencies and counters to the coordinator.
+    bot.loop.create_task(sharding.report_stats(bot, lambda: {"counters": dict(metrics.counters)}))
+
     try:
         bot.run(TOKEN)
     except discord.errors.LoginFailure as e:
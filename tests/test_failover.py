@@ -0,0 +1,161 @@
+"""
+Failover of players between two stub Lavalink nodes (benchmarks/stub_lavalink.py).
+
+No Discord connection is needed: the bot never logs in and voice channels
+connect players directly, the way the gateway handshake would.
+"""
+import asyncio
+import itertools
+import types
+import discord
+import wavelink
+from benchmarks.stub_lavalink import StubLavalink
+from utils import lavalink_manager
+from utils.lavalink_manager import BalancedPlayer
+
+_ids = itertools.count(10**17)
+
+class FakeBot(discord.Bot):
+    def __init__(self):
+        super().__init__(intents=discord.Intents.none())
+        self._fake_user = types.SimpleNamespace(id=next(_ids), name="DAVE")
+        self.guilds_by_id: dict[int, "FakeGuild"] = {}
+
+    @property
+    def user(self):
+        return self._fake_user
+
+    @property
+    def voice_clients(self):
+        return [guild.voice_client for guild in self.guilds_by_id.values() if guild.voice_client is not None]
+
+class FakeVoiceChannel:
+    def __init__(self, bot: FakeBot, guild: "FakeGuild"):
+        self.id = next(_ids)
+        self.name = "General"
+        self.bot = bot
+        self.guild = guild
+
+    async def connect(self, *, cls=wavelink.Player, **kwargs) -> wavelink.Player:
+        # What Player.connect and the voice handshake would leave behind.
+        player = cls(self.bot, self)
+        player._guild = self.guild
+        player._connected = True
+        player.node._players[self.guild.id] = player
+        self.guild.voice_client = player
+        return player
+
+class FakeGuild:
+    def __init__(self, bot: FakeBot):
+        self.id = next(_ids)
+        self.name = f"Guild {self.id}"
+        self.voice_client = None
+        self.voice_channel = FakeVoiceChannel(bot, self)
+        bot.guilds_by_id[self.id] = self
+
+    async def change_voice_state(self, *, channel=None, **kwargs):
+        if channel is None:
+            self.voice_client = None
+
+async def start_pool():
+    stubs = [StubLavalink(), StubLavalink()]
+    for stub in stubs:
+        await stub.start()
+    bot = FakeBot()
+    nodes = [
+        # Closed nodes stay registered with the Pool, so every test uses new identifiers.
+        wavelink.Node(identifier=f"Node{index}-{stub.port}", uri=stub.uri, password="stub", retries=0)
+        for index, stub in enumerate(stubs, start=1)
+    ]
+    await wavelink.Pool.connect(nodes=nodes, client=bot)
+    for _ in range(100):
+        if len(lavalink_manager.healthy_nodes()) == len(nodes):
+            break
+        await asyncio.sleep(0.01)
+    return bot, stubs, nodes
+
+async def stop_pool(stubs):
+    await wavelink.Pool.close()
+    for stub in stubs:
+        await stub.stop()
+    lavalink_manager.node_stats.clear()
+    lavalink_manager.unhealthy_nodes.clear()
+    lavalink_manager.failed_checks.clear()
+
+async def playing_guild(bot: FakeBot, node: wavelink.Node) -> FakeGuild:
+    guild = FakeGuild(bot)
+    player = await guild.voice_channel.connect(cls=BalancedPlayer, nodes=[node])
+    player.queue = wavelink.Queue()
+    tracks = await wavelink.Playable.search("song", node=node)
+    await player.play(tracks[0])
+    return guild
+
+def run_failover(break_node, checks: int = 1):
+    async def scenario():
+        bot, stubs, (dead, alive) = await start_pool()
+        try:
+            guild = await playing_guild(bot, dead)
+            track = guild.voice_client.current
+            await break_node(stubs[0])
+
+            for _ in range(checks):
+                for node in (dead, alive):
+                    await lavalink_manager.check_node(bot, node)
+
+            assert lavalink_manager.healthy_nodes() == [alive]
+            assert dead.identifier not in lavalink_manager.node_stats
+            assert lavalink_manager.best_node() is alive
+            player = guild.voice_client
+            assert player is not None and player.node is alive
+            assert player.current is not None and player.current.encoded == track.encoded
+            assert stubs[1].players[str(guild.id)]["track"]["encoded"] == track.encoded
+        finally:
+            await stop_pool(stubs)
+    asyncio.run(scenario())
+
+def test_failover_when_node_stops():
+    # The process is gone: its websocket closes and REST calls are refused.
+    async def stop(stub: StubLavalink):
+        await stub.stop()
+        await asyncio.sleep(0.05)
+    run_failover(stop)
+
+def test_failover_when_node_stops_answering_while_websocket_stays_open():
+    # wavelink still reports the node as CONNECTED; only the stats request fails.
+    async def hang(stub: StubLavalink):
+        stub.failing = True
+    run_failover(hang, checks=lavalink_manager.FAILOVER_AFTER)
+
+def test_one_failed_check_keeps_players_on_the_node():
+    async def scenario():
+        bot, stubs, (flaky, other) = await start_pool()
+        try:
+            guild = await playing_guild(bot, flaky)
+            stubs[0].failing = True
+            for _ in range(lavalink_manager.FAILOVER_AFTER - 1):
+                await lavalink_manager.check_node(bot, flaky)
+            # No new players are placed on it, but the ones playing there stay.
+            assert lavalink_manager.healthy_nodes() == [other]
+            assert guild.voice_client.node is flaky
+            stubs[0].failing = False
+            await lavalink_manager.check_node(bot, flaky)
+            assert flaky in lavalink_manager.healthy_nodes()
+            assert flaky.identifier not in lavalink_manager.failed_checks
+        finally:
+            await stop_pool(stubs)
+    asyncio.run(scenario())
+
+def test_node_recovers_after_stats_succeed_again():
+    async def scenario():
+        bot, stubs, (flaky, other) = await start_pool()
+        try:
+            stubs[0].failing = True
+            await lavalink_manager.check_node(bot, flaky)
+            assert flaky not in lavalink_manager.healthy_nodes()
+            stubs[0].failing = False
+            await lavalink_manager.check_node(bot, flaky)
+            assert flaky in lavalink_manager.healthy_nodes()
+            assert flaky.identifier in lavalink_manager.node_stats
+        finally:
+            await stop_pool(stubs)
+    asyncio.run(scenario())
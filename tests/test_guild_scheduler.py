@@ -0,0 +1,39 @@
+import asyncio
+import types
+from utils.guild_scheduler import GuildScheduler
+
+class FakePlayer:
+    def __init__(self, latency: float = 0.05):
+        self.guild = types.SimpleNamespace(id=1)
+        self.latency = latency
+        self.updates = []
+
+    async def update(self, **changes):
+        self.updates.append(changes)
+        await asyncio.sleep(self.latency)
+
+def test_first_volume_change_is_sent_right_away():
+    async def run():
+        player = FakePlayer(latency=0)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        applied = await GuildScheduler().set_volume(player, 40)
+        return applied, player.updates, loop.time() - start
+
+    applied, updates, elapsed = asyncio.run(run())
+    assert applied == 40
+    assert updates == [{"volume": 40}]
+    assert elapsed < 0.05
+
+def test_changes_during_an_update_are_merged_into_one():
+    async def run():
+        scheduler, player = GuildScheduler(), FakePlayer()
+        first = asyncio.create_task(scheduler.set_volume(player, 10))
+        await asyncio.sleep(0.01)
+        later = await asyncio.gather(*(scheduler.set_volume(player, level) for level in (20, 30, 40)))
+        return await first, later, player.updates
+
+    first, later, updates = asyncio.run(run())
+    assert first == 10
+    assert later == [40, 40, 40]
+    assert updates == [{"volume": 10}, {"volume": 40}]
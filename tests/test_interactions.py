@@ -0,0 +1,38 @@
+import asyncio
+import types
+from utils import responses
+from utils.guild_scheduler import GuildScheduler
+from utils.interactions import deferred
+from utils.metrics import metrics
+
+class FakeContext:
+    def __init__(self, guild_id: int):
+        self.guild = types.SimpleNamespace(id=guild_id)
+        self.command = types.SimpleNamespace(qualified_name="play")
+        self.interaction = types.SimpleNamespace(id=guild_id)
+        self.calls = []
+
+    async def defer(self, **kwargs):
+        self.calls.append(("defer", kwargs))
+
+    async def respond(self, content=None, **kwargs):
+        self.calls.append(("respond", content, kwargs))
+
+@deferred(rate_limit=True)
+async def command(self, ctx):
+    await ctx.respond("done")
+
+def test_rate_limited_reply_is_ephemeral_and_not_deferred(monkeypatch):
+    monkeypatch.setattr("utils.interactions.guild_scheduler", GuildScheduler(rate=0.0, burst=1))
+    allowed, rejected = FakeContext(1), FakeContext(1)
+    asyncio.run(command(None, allowed))
+    asyncio.run(command(None, rejected))
+    assert allowed.calls == [("defer", {"ephemeral": False}), ("respond", "done", {})]
+    assert rejected.calls == [("respond", responses.RATE_LIMITED, {"ephemeral": True})]
+
+def test_no_latency_samples_while_metrics_are_off(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+    monkeypatch.setattr("utils.interactions.guild_scheduler", GuildScheduler())
+    histograms = dict(metrics.histograms)
+    asyncio.run(command(None, FakeContext(2)))
+    assert metrics.histograms == histograms
@@ -0,0 +1,39 @@
+import asyncio
+import types
+import wavelink
+from benchmarks.stub_lavalink import fake_track
+from cogs.music import Play
+
+def test_playback_starts_with_the_first_resolved_query_and_queue_keeps_order(monkeypatch):
+    delays = {"slow": 0.05, "fast": 0.0, "medium": 0.02}
+    played = []
+
+    async def search_for_tracks(query):
+        await asyncio.sleep(delays[query])
+        return [wavelink.Playable(fake_track(query))]
+
+    async def play_song(vc, song, ctx):
+        played.append(song.title)
+        vc.playing = True
+
+    async def reply(ctx, content=None, **kwargs):
+        pass
+
+    monkeypatch.setattr(Play, "search_for_tracks", search_for_tracks)
+    monkeypatch.setattr(Play, "play_song", play_song)
+    monkeypatch.setattr(Play, "respond", reply)
+    monkeypatch.setattr(Play, "edit", reply)
+    monkeypatch.setattr(Play, "log_command_invocation", lambda *args: None)
+    monkeypatch.setattr(Play.track_prefetcher, "schedule", lambda vc: None)
+    monkeypatch.setattr(Play.player_state, "mark_dirty", lambda vc: None)
+
+    async def scenario():
+        guild = types.SimpleNamespace(id=1)
+        vc = types.SimpleNamespace(guild=guild, playing=False, queue=wavelink.Queue())
+        ctx = types.SimpleNamespace(guild=guild)
+        await Play.PlayCog.play_many(None, ctx, vc, ["slow", "fast", "medium"])
+        return vc
+
+    vc = asyncio.run(scenario())
+    assert played == ["Track 0 for fast"]
+    assert [track.title for track in vc.queue] == ["Track 0 for slow", "Track 0 for medium"]
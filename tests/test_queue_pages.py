@@ -0,0 +1,31 @@
+import types
+import wavelink
+from benchmarks.stub_lavalink import fake_track
+from cogs.music.Queue import QueuePages
+from utils.lavalink_manager import TrackQueue
+
+def test_pages_are_rerendered_when_a_middle_track_is_replaced():
+    queue = TrackQueue()
+    queue.put([wavelink.Playable(fake_track("song", index)) for index in range(3)])
+    vc = types.SimpleNamespace(queue=queue, current=None)
+    pages = QueuePages()
+    assert "Track 1 for song" in pages.render(vc, 0)
+
+    # What the prefetcher does when it swaps in a fresh copy of a track.
+    queue.delete(1)
+    queue.put_at(1, wavelink.Playable(fake_track("fresh", 1)))
+    page = pages.render(vc, 0)
+    assert "Track 1 for fresh" in page and "Track 1 for song" not in page
+
+    queue.swap(0, 2)
+    assert pages.render(vc, 0).index("Track 2 for song") < pages.render(vc, 0).index("Track 0 for song")
+
+def test_plain_queues_are_adopted_with_their_tracks():
+    plain = wavelink.Queue()
+    plain.put(wavelink.Playable(fake_track("song")))
+    adopted = TrackQueue.adopt(plain)
+    assert [track.title for track in adopted] == ["Track 0 for song"]
+    assert adopted.history is plain.history
+    version = adopted.version
+    adopted.get()
+    assert adopted.version > version
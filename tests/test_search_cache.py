@@ -0,0 +1,24 @@
+import asyncio
+from utils.search_cache import SearchCache
+
+def test_waiters_fetch_again_when_the_leading_fetch_is_cancelled():
+    async def scenario():
+        cache = SearchCache()
+        key = cache.make_key("song")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05 if len(calls) == 1 else 0)
+            return ["track"]
+
+        leader = asyncio.create_task(cache.get_or_fetch(key, fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_fetch(key, fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await waiter == ["track"]
+        assert leader.cancelled()
+        assert len(calls) == 2
+        assert cache.get(key) == ["track"]
+    asyncio.run(scenario())
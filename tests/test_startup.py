@@ -0,0 +1,73 @@
+import asyncio
+import types
+import discord
+from utils import startup
+
+class FakeBot(discord.Bot):
+    def __init__(self, remote: list[dict]):
+        super().__init__(intents=discord.Intents.none(), auto_sync_commands=False)
+        self._fake_user = types.SimpleNamespace(id=1, name="DAVE")
+        self.invoked = []
+
+        async def get_global_commands(application_id):
+            return remote
+        self.http.get_global_commands = get_global_commands
+
+        @self.slash_command(name="ping")
+        async def ping(ctx):
+            pass
+
+    @property
+    def user(self):
+        return self._fake_user
+
+    async def get_application_context(self, interaction, cls=None):
+        return types.SimpleNamespace(interaction=interaction, command=None)
+
+    async def invoke_application_command(self, ctx):
+        self.invoked.append(ctx.command.name)
+
+def test_guild_interaction_dispatches_after_skipped_sync(tmp_path):
+    async def scenario():
+        bot = FakeBot(remote=[{"id": "42", "name": "ping", "type": 1}])
+        hash_file = tmp_path / "command_hash.txt"
+        hash_file.write_text(startup.command_hash(bot), encoding="utf-8")
+
+        async def sync_commands(*args, **kwargs):
+            raise AssertionError("unchanged commands must not be synced")
+        bot.sync_commands = sync_commands
+
+        assert not await startup.sync_commands_if_changed(bot, str(hash_file))
+        interaction = types.SimpleNamespace(
+            type=discord.InteractionType.application_command,
+            data={"id": "42", "name": "ping", "guild_id": "123"},
+        )
+        await bot.process_application_commands(interaction)
+        assert bot.invoked == ["ping"]
+    asyncio.run(scenario())
+
+def test_commands_missing_remotely_are_synced(tmp_path):
+    async def scenario():
+        bot = FakeBot(remote=[])
+        hash_file = tmp_path / "command_hash.txt"
+        hash_file.write_text(startup.command_hash(bot), encoding="utf-8")
+        synced = []
+
+        async def sync_commands(*args, **kwargs):
+            synced.append(True)
+        bot.sync_commands = sync_commands
+
+        assert await startup.sync_commands_if_changed(bot, str(hash_file))
+        assert synced
+    asyncio.run(scenario())
+
+def test_only_commands_of_unloaded_cogs_are_pending(tmp_path):
+    async def scenario():
+        bot = FakeBot(remote=[])
+        pipeline = startup.StartupPipeline(bot, cogs_dir=str(tmp_path))
+        pipeline.deferred_loaded = False
+        # /ping belongs to a loaded cog but has no Discord id yet.
+        assert bot.get_application_command("ping") is None
+        assert not pipeline.is_pending_command("ping")
+        assert pipeline.is_pending_command("play")
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import wavelink
+from benchmarks.stub_lavalink import fake_track
+from cogs.music.Play import split_queries
+from utils.track_index import TrackIndex
+
+def playable(key: str, index: int = 0, title: str = None, author: str = None) -> wavelink.Playable:
+    data = fake_track(key, index)
+    if title is not None:
+        data["info"]["title"] = title
+    if author is not None:
+        data["info"]["author"] = author
+    return wavelink.Playable(data)
+
+def test_remember_at_capacity_keeps_the_new_track():
+    index = TrackIndex(max_tracks=3)
+    for number in range(3):
+        track = playable("old", number)
+        index.remember(f"old {number}", track)
+        index.record_play(track)
+    new = playable("new")
+    index.remember("new song", new)
+    assert new.encoded in index.records
+    assert index.lookup("new song").encoded == new.encoded
+    assert len(index.records) == 3
+
+def test_suggest_matches_titles_without_the_author():
+    index = TrackIndex()
+    index.remember("bohemian", playable("queen", title="Bohemian Rhapsody", author="Queen"))
+    assert index.suggest("bohemian rha") == ["Queen - Bohemian Rhapsody"]
+    # Matching on both the label and the title only offers the track once.
+    index.remember("rhapsody", playable("rhapsody", title="Rhapsody", author="Rhapsody"))
+    assert index.suggest("rhapsody") == ["Rhapsody - Rhapsody"]
+
+def test_autocomplete_choice_with_commas_is_not_split(monkeypatch):
+    index = TrackIndex()
+    monkeypatch.setattr("cogs.music.Play.track_index", index)
+    index.remember("earfquake", playable("tyler", title="EARFQUAKE", author="Tyler, The Creator"))
+    (choice,) = index.suggest("tyler")
+    assert split_queries(choice) == ["Tyler, The Creator - EARFQUAKE"]
+    assert split_queries("never heard; of these") == ["never heard", "of these"]
+
+def test_commas_in_a_new_query_do_not_split_it(monkeypatch):
+    monkeypatch.setattr("cogs.music.Play.track_index", TrackIndex())
+    assert split_queries("Tyler, The Creator - EARFQUAKE") == ["Tyler, The Creator - EARFQUAKE"]
+    assert split_queries("first song\nsecond, with a comma") == ["first song", "second, with a comma"]
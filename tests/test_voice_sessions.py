@@ -0,0 +1,69 @@
+import asyncio
+import discord
+import wavelink
+from utils.voice_sessions import VoiceSessionManager
+
+class FakePlayer:
+    def __init__(self, guild: "FakeGuild", channel: "FakeVoiceChannel"):
+        self.guild = guild
+        self.channel = channel
+        self.connected = True
+        self.playing = False
+
+    async def disconnect(self, **kwargs):
+        # What wavelink's Player._destroy and VoiceProtocol.cleanup undo.
+        self.connected = False
+        self.guild.node_players.pop(self.guild.id, None)
+        self.guild.voice_client = None
+
+class FakeVoiceChannel:
+    def __init__(self, guild: "FakeGuild", timeouts: int):
+        self.id = 2
+        self.guild = guild
+        self.timeouts = timeouts
+
+    async def connect(self, *, cls=None, **kwargs) -> FakePlayer:
+        # Like discord.abc.Connectable.connect: register first, then handshake.
+        if self.guild.voice_client is not None:
+            raise discord.ClientException("Already connected to a voice channel.")
+        player = self.guild.voice_client = FakePlayer(self.guild, self)
+        self.guild.node_players[self.guild.id] = player
+        if self.timeouts:
+            self.timeouts -= 1
+            raise wavelink.ChannelTimeoutException("Unable to connect to General")
+        return player
+
+class FakeGuild:
+    def __init__(self, timeouts: int):
+        self.id = 1
+        self.voice_client = None
+        self.node_players = {}
+        self.voice_channel = FakeVoiceChannel(self, timeouts)
+
+def manager() -> VoiceSessionManager:
+    sessions = VoiceSessionManager()
+    sessions.configure({"BACKOFF_BASE": 0})
+    return sessions
+
+def test_connect_retries_after_a_handshake_timeout():
+    guild = FakeGuild(timeouts=1)
+    sessions = manager()
+    player, created = asyncio.run(sessions.connect(guild.voice_channel))
+    assert created and player.connected
+    assert guild.voice_client is player
+    assert guild.node_players == {guild.id: player}
+    assert sessions.counts["connect_retries"] == 1
+    assert sessions.sessions[guild.id].state == "connected"
+
+def test_failed_connect_leaves_no_voice_client_behind():
+    guild = FakeGuild(timeouts=10)
+    sessions = manager()
+    try:
+        asyncio.run(sessions.connect(guild.voice_channel))
+    except wavelink.ChannelTimeoutException:
+        pass
+    else:
+        raise AssertionError("connect should have given up")
+    assert guild.voice_client is None
+    assert guild.node_players == {}
+    assert sessions.counts["connect_failures"] == 1
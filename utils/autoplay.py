@@ -0,0 +1,257 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import re
+import typing
+import wavelink
+from utils.idle_policy import CompactTrack
+from utils.metrics import metrics
+
+# Recommendations kept ready per guild.
+DEFAULT_BUFFER_SIZE = 3
+# Tracks remembered per guild.
+DEFAULT_HISTORY_SIZE = 200
+# Tracks known to the engine across all guilds; the least recently seen are dropped first.
+DEFAULT_MAX_CANDIDATES = 5000
+# The most recent history entries that seed a recommendation, weighted by recency.
+SEED_COUNT = 20
+SEED_DECAY = 0.85
+# Tracks enqueued within this many positions of each other count as co-occurring.
+COOCCURRENCE_WINDOW = 3
+# Recently played tracks are never recommended again.
+EXCLUDE_RECENT = 50
+# Upper bound on the candidates scored per refill, and on how many tracks a
+# single title word may pull in (common words say little about similarity).
+MAX_SCORED = 2000
+MAX_TOKEN_FANOUT = 300
+
+ARTIST_WEIGHT = 1.0
+TITLE_WEIGHT = 1.5
+COOCCURRENCE_WEIGHT = 0.5
+
+STOPWORDS = frozenset({"the", "and", "feat", "with", "official", "video", "audio", "lyrics", "remix", "mix", "version"})
+
+def tokenize(text: str) -> frozenset:
+    return frozenset(word for word in re.findall(r"\w+", text.casefold()) if len(word) > 2 and word not in STOPWORDS)
+
+class Candidate:
+    __slots__ = ("track", "author", "tokens")
+
+    def __init__(self, track: CompactTrack, author: str, tokens: frozenset):
+        self.track = track
+        self.author = author
+        self.tokens = tokens
+
+def score_candidates(seeds: list[tuple[str, frozenset, float]],
+                     candidates: list[tuple[str, str, frozenset, float]],
+                     limit: int) -> list[str]:
+    """
+    Rank candidates against the seed tracks and return the best encoded ids.
+
+    seeds are (author, title tokens, weight); candidates are (encoded, author,
+    title tokens, co-occurrence with the seeds). Only reads immutable data, so
+    it can run in a worker thread.
+    """
+    scored = []
+    for encoded, author, tokens, cooccurrence in candidates:
+        score = COOCCURRENCE_WEIGHT * cooccurrence
+        for seed_author, seed_tokens, weight in seeds:
+            similarity = ARTIST_WEIGHT if author and author == seed_author else 0.0
+            if tokens and seed_tokens:
+                shared = len(tokens & seed_tokens)
+                if shared:
+                    similarity += TITLE_WEIGHT * shared / len(tokens | seed_tokens)
+            score += weight * similarity
+        if score > 0:
+            scored.append((score, encoded))
+    return [encoded for _, encoded in heapq.nlargest(limit, scored)]
+
+class AutoplayEngine:
+    """
+    Recommends what to play when a guild's queue runs out, from listening
+    history kept in memory.
+
+    Every track enqueued is recorded in its guild's history and indexed by
+    artist and title words; tracks enqueued close together in any guild count
+    as co-occurring. For guilds with autoplay on, a few recommendations are
+    scored in a worker thread ahead of time, so the track end handler only
+    has to pop one.
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE, history_size: int = DEFAULT_HISTORY_SIZE,
+                 max_candidates: int = DEFAULT_MAX_CANDIDATES):
+        self.buffer_size = buffer_size
+        self.history_size = history_size
+        self.max_candidates = max_candidates
+        self.enabled: set[int] = set()
+        self._history: dict[int, collections.deque] = {}
+        self._candidates: collections.OrderedDict[str, Candidate] = collections.OrderedDict()
+        self._index: collections.defaultdict = collections.defaultdict(set)
+        self._cooccurrence: collections.defaultdict = collections.defaultdict(collections.Counter)
+        self._buffers: dict[int, collections.deque] = {}
+        self._refills: dict[int, asyncio.Task] = {}
+        self.played = 0
+        self.empty = 0
+
+    def configure(self, config: dict) -> None:
+        self.buffer_size = config.get("BUFFER_SIZE", self.buffer_size)
+        self.history_size = config.get("HISTORY_SIZE", self.history_size)
+        self.max_candidates = config.get("MAX_CANDIDATES", self.max_candidates)
+
+    def toggle(self, guild_id: int) -> bool:
+        """Turn autoplay on or off for a guild; returns the new state."""
+        if guild_id in self.enabled:
+            self.enabled.discard(guild_id)
+            self._buffers.pop(guild_id, None)
+            return False
+        self.enabled.add(guild_id)
+        self.schedule_refill(guild_id)
+        return True
+
+    def _index_track(self, track: wavelink.Playable) -> None:
+        candidate = self._candidates.get(track.encoded)
+        if candidate is not None:
+            self._candidates.move_to_end(track.encoded)
+            return
+        author = " ".join(track.author.casefold().split())
+        candidate = Candidate(CompactTrack.from_playable(track), author, tokenize(track.title))
+        self._candidates[track.encoded] = candidate
+        for key in self._keys(candidate):
+            self._index[key].add(track.encoded)
+        while len(self._candidates) > self.max_candidates:
+            self._drop(*self._candidates.popitem(last=False))
+
+    @staticmethod
+    def _keys(candidate: Candidate) -> list[str]:
+        # Artists share the index with title words under a prefix that words can't contain.
+        return [f"@{candidate.author}", *candidate.tokens] if candidate.author else list(candidate.tokens)
+
+    def _drop(self, encoded: str, candidate: Candidate) -> None:
+        for key in self._keys(candidate):
+            encoded_ids = self._index.get(key)
+            if encoded_ids is not None:
+                encoded_ids.discard(encoded)
+                if not encoded_ids:
+                    del self._index[key]
+        for neighbour in self._cooccurrence.pop(encoded, {}):
+            counter = self._cooccurrence.get(neighbour)
+            if counter is not None:
+                counter.pop(encoded, None)
+
+    def record(self, guild_id: int, tracks: typing.Iterable[wavelink.Playable], organic: bool = True) -> None:
+        """
+        Add enqueued tracks to the guild's history. Autoplayed tracks pass
+        organic=False so they steer later picks without reinforcing themselves.
+        """
+        history = self._history.get(guild_id)
+        if history is None:
+            history = self._history[guild_id] = collections.deque(maxlen=self.history_size)
+        for track in tracks:
+            if not track.encoded:
+                continue
+            self._index_track(track)
+            if organic:
+                for previous in itertools.islice(reversed(history), COOCCURRENCE_WINDOW):
+                    if previous != track.encoded:
+                        self._cooccurrence[previous][track.encoded] += 1
+                        self._cooccurrence[track.encoded][previous] += 1
+            history.append(track.encoded)
+        if guild_id in self.enabled:
+            self.schedule_refill(guild_id)
+
+    def next(self, guild_id: int) -> typing.Optional[wavelink.Playable]:
+        """Pop a ready recommendation for the guild, or None if autoplay is off or nothing is ready."""
+        if guild_id not in self.enabled:
+            return None
+        buffer = self._buffers.get(guild_id)
+        track = buffer.popleft().to_playable() if buffer else None
+        if track is None:
+            self.empty += 1
+        else:
+            self.played += 1
+            metrics.increment("autoplay_tracks_total")
+            self.record(guild_id, [track], organic=False)
+        self.schedule_refill(guild_id)
+        return track
+
+    def schedule_refill(self, guild_id: int) -> None:
+        buffer = self._buffers.get(guild_id)
+        if buffer is not None and len(buffer) >= self.buffer_size:
+            return
+        task = self._refills.get(guild_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._refill(guild_id))
+        self._refills[guild_id] = task
+        task.add_done_callback(lambda t: self._refills.pop(guild_id, None) if self._refills.get(guild_id) is t else None)
+
+    def _snapshot(self, guild_id: int, exclude: set[str]) -> tuple[list, list]:
+        """Collect the seeds and the candidates worth scoring, as immutable data for the worker thread."""
+        history = self._history.get(guild_id) or ()
+        seeds, pool = [], collections.Counter()
+        for age, encoded in enumerate(itertools.islice(reversed(history), SEED_COUNT)):
+            candidate = self._candidates.get(encoded)
+            if candidate is None:
+                continue
+            weight = SEED_DECAY ** age
+            seeds.append((candidate.author, candidate.tokens, weight))
+            for neighbour, count in self._cooccurrence.get(encoded, {}).items():
+                pool[neighbour] += count * weight
+            for key in self._keys(candidate):
+                encoded_ids = self._index.get(key, ())
+                if len(encoded_ids) <= MAX_TOKEN_FANOUT:
+                    for other in encoded_ids:
+                        pool[other] += 0
+            if len(pool) >= MAX_SCORED:
+                break
+
+        candidates = [
+            (encoded, candidate.author, candidate.tokens, cooccurrence)
+            for encoded, cooccurrence in pool.items()
+            if encoded not in exclude and (candidate := self._candidates.get(encoded)) is not None
+        ]
+        return seeds, candidates
+
+    async def _refill(self, guild_id: int) -> None:
+        buffer = self._buffers.setdefault(guild_id, collections.deque())
+        missing = self.buffer_size - len(buffer)
+        if missing <= 0 or guild_id not in self.enabled:
+            return
+        history = self._history.get(guild_id) or ()
+        exclude = set(itertools.islice(reversed(history), EXCLUDE_RECENT)) | {track.encoded for track in buffer}
+        seeds, candidates = self._snapshot(guild_id, exclude)
+        if not seeds or not candidates:
+            return
+        try:
+            with metrics.timer("autoplay.score"):
+                picks = await asyncio.to_thread(score_candidates, seeds, candidates, missing)
+        except Exception as e:
+            logging.error(f"Failed to score autoplay candidates for guild {guild_id}: {e}")
+            return
+        if guild_id not in self.enabled:
+            return
+        for encoded in picks:
+            candidate = self._candidates.get(encoded)
+            if candidate is not None:
+                buffer.append(candidate.track)
+
+    def forget(self, guild_id: int) -> None:
+        self.enabled.discard(guild_id)
+        self._history.pop(guild_id, None)
+        self._buffers.pop(guild_id, None)
+        task = self._refills.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "guilds": len(self.enabled),
+            "candidates": len(self._candidates),
+            "played": self.played,
+            "empty": self.empty,
+        }
+
+# Shared instance used by the music cogs.
+autoplay = AutoplayEngine()
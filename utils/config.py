@@ -0,0 +1,205 @@
+"""
+Configuration loading, validation and hot reload.
+
+data/config.json is parsed and validated once at startup into a Config, a
+dict of sections that cogs read as bot.config["SECTION"]. Editing the file
+(or sending SIGHUP) reloads it: sections that can change at runtime are
+swapped in and their listeners called, while sections read only at startup
+(the Discord token and guilds, sharding, logging, the player state database)
+keep their old values until the next restart.
+"""
+import asyncio
+import collections
+import inspect
+import json
+import logging
+import os
+import signal
+import typing
+
+NUMBER = (int, float)
+
+# Expected type of every known key, per section.
+SCHEMA: dict[str, dict[str, typing.Any]] = {
+    "DISCORD": {"DISCORD_TOKEN": str, "GUILD_IDS": list},
+    "LAVALINK": {
+        "NODES": list,
+        "LAVALINK_HOST": str,
+        "LAVALINK_PORT": int,
+        "LAVALINK_PASSWORD": str,
+        "STATS_INTERVAL": NUMBER,
+    },
+    "LOGGING": {
+        "ASYNC": bool,
+        "QUEUE_SIZE": int,
+        "MAX_BYTES": int,
+        "BACKUP_COUNT": int,
+        "ROTATE_INTERVAL": NUMBER,
+        "COMPRESS": bool,
+    },
+    "PLAYER_STATE": {"PATH": str, "FLUSH_INTERVAL": NUMBER},
+    "METRICS": {"ENABLED": bool, "HOST": str, "PORT": int},
+    "SHARDING": {"MODE": str, "SHARD_COUNT": (int, type(None)), "CLUSTERS": int, "COORDINATOR_PORT": int},
+    "RATE_LIMIT": {"RATE": NUMBER, "BURST": int},
+    "TRACK_INDEX": {"PATH": str, "MAX_TRACKS": int},
+    "IDLE": {"DISCONNECT_AFTER": NUMBER, "COMPACT_AFTER": NUMBER, "HISTORY_LIMIT": int, "SWEEP_INTERVAL": NUMBER},
+    "AUTOPLAY": {"BUFFER_SIZE": int, "HISTORY_SIZE": int, "MAX_CANDIDATES": int},
+    "VOICE": {
+        "MAX_CONCURRENT_CONNECTS": int,
+        "CONNECT_TIMEOUT": NUMBER,
+        "CONNECT_ATTEMPTS": int,
+        "BACKOFF_BASE": NUMBER,
+        "BACKOFF_MAX": NUMBER,
+    },
+    "RELOAD": {"WATCH_INTERVAL": NUMBER},
+}
+NODE_SCHEMA = {"IDENTIFIER": str, "LAVALINK_HOST": str, "LAVALINK_PORT": int, "LAVALINK_PASSWORD": str, "RETRIES": int}
+SHARDING_MODES = ("none", "auto", "cluster")
+# Sections only read at startup; changes to them are reported but need a restart.
+RESTART_SECTIONS = ("DISCORD", "SHARDING", "LOGGING", "PLAYER_STATE")
+# Seconds between checks of the config file for changes.
+DEFAULT_WATCH_INTERVAL = 5
+
+class ConfigError(Exception):
+    pass
+
+def _type_name(expected) -> str:
+    if isinstance(expected, tuple):
+        return " or ".join(t.__name__ for t in expected)
+    return expected.__name__
+
+def _check(errors: list[str], where: str, value, expected) -> None:
+    # bool is an int subclass, but true/false is never a valid number here.
+    if isinstance(value, bool) and expected is not bool:
+        errors.append(f"{where} must be {_type_name(expected)}, got {value!r}")
+    elif not isinstance(value, expected):
+        errors.append(f"{where} must be {_type_name(expected)}, got {type(value).__name__}")
+    elif isinstance(value, NUMBER) and not isinstance(value, bool) and value < 0:
+        errors.append(f"{where} must not be negative")
+
+def validate(data: dict) -> list[str]:
+    """Return every problem found in the config; an empty list means it is valid."""
+    errors = []
+    token = data.get("DISCORD", {}).get("DISCORD_TOKEN")
+    if not token:
+        errors.append("DISCORD.DISCORD_TOKEN is not set")
+
+    for section, values in data.items():
+        schema = SCHEMA.get(section)
+        if schema is None:
+            logging.warning(f"Unknown config section {section}")
+            continue
+        if not isinstance(values, dict):
+            errors.append(f"{section} must be an object")
+            continue
+        for key, value in values.items():
+            if key not in schema:
+                logging.warning(f"Unknown config key {section}.{key}")
+                continue
+            _check(errors, f"{section}.{key}", value, schema[key])
+
+    for index, node in enumerate(data.get("LAVALINK", {}).get("NODES") or []):
+        if not isinstance(node, dict):
+            errors.append(f"LAVALINK.NODES[{index}] must be an object")
+            continue
+        for key, value in node.items():
+            if key in NODE_SCHEMA:
+                _check(errors, f"LAVALINK.NODES[{index}].{key}", value, NODE_SCHEMA[key])
+        if not node.get("LAVALINK_PASSWORD"):
+            errors.append(f"LAVALINK.NODES[{index}].LAVALINK_PASSWORD is not set")
+
+    for guild_id in data.get("DISCORD", {}).get("GUILD_IDS") or []:
+        if not isinstance(guild_id, int) or isinstance(guild_id, bool):
+            errors.append(f"DISCORD.GUILD_IDS must only contain guild ids, got {guild_id!r}")
+
+    mode = data.get("SHARDING", {}).get("MODE", "none")
+    if mode not in SHARDING_MODES:
+        errors.append(f"SHARDING.MODE must be one of {', '.join(SHARDING_MODES)}, got {mode!r}")
+    return errors
+
+def read_config(path: str, overlay: typing.Optional[typing.Callable[[], typing.Optional[dict]]] = None) -> dict:
+    """Read and validate the config file, merging the sections returned by overlay."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if overlay is not None:
+        data.update(overlay() or {})
+    errors = validate(data)
+    if errors:
+        raise ConfigError(f"Invalid configuration in {path}: " + "; ".join(errors))
+    return data
+
+class Config(dict):
+    """The validated config sections, with listeners for sections reloaded at runtime."""
+
+    def __init__(self, path: str, data: dict, overlay: typing.Optional[typing.Callable[[], typing.Optional[dict]]] = None):
+        super().__init__(data)
+        self.path = path
+        self._overlay = overlay
+        self._listeners: collections.defaultdict = collections.defaultdict(list)
+        self._mtime = self._stat()
+        self._reload_lock = asyncio.Lock()
+        self.reloads = 0
+
+    @classmethod
+    def load(cls, path: str, overlay: typing.Optional[typing.Callable[[], typing.Optional[dict]]] = None) -> "Config":
+        return cls(path, read_config(path, overlay), overlay)
+
+    def _stat(self) -> float:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return 0.0
+
+    def on_reload(self, section: str, callback: typing.Callable[[dict], typing.Any]) -> None:
+        """Call callback (sync or async) with the new section whenever it changes on reload."""
+        self._listeners[section].append(callback)
+
+    async def reload(self) -> list[str]:
+        """Re-read the file and apply the changed sections; returns the names of the applied sections."""
+        async with self._reload_lock:
+            self._mtime = self._stat()
+            try:
+                data = await asyncio.to_thread(read_config, self.path, self._overlay)
+            except (OSError, ValueError, ConfigError) as e:
+                logging.error(f"Config reload failed, keeping the current config: {e}")
+                return []
+
+            applied = []
+            for section in sorted(set(self) | set(data)):
+                values = data.get(section, {})
+                if values == self.get(section, {}):
+                    continue
+                if section in RESTART_SECTIONS:
+                    logging.warning(f"Config section {section} changed; restart the bot to apply it.")
+                    continue
+                self[section] = values
+                applied.append(section)
+                for callback in self._listeners[section]:
+                    try:
+                        result = callback(values)
+                        if inspect.isawaitable(result):
+                            await result
+                    except Exception as e:
+                        logging.error(f"Failed to apply config section {section}: {e}")
+
+            self.reloads += 1
+            logging.info(f"Reloaded config from {self.path}: {', '.join(applied) or 'no changes'}")
+            return applied
+
+    def install_signal_handler(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Reload the config on SIGHUP where the platform supports it."""
+        if not hasattr(signal, "SIGHUP"):
+            return
+        try:
+            loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(self.reload()))
+        except (NotImplementedError, RuntimeError) as e:
+            logging.warning(f"Config reload on SIGHUP unavailable: {e}")
+
+    async def watch(self):
+        """Reload the config whenever the file's modification time changes."""
+        while True:
+            interval = self.get("RELOAD", {}).get("WATCH_INTERVAL", DEFAULT_WATCH_INTERVAL)
+            await asyncio.sleep(interval or DEFAULT_WATCH_INTERVAL)
+            # A WATCH_INTERVAL of 0 turns file watching off; SIGHUP still reloads.
+            if interval and self._stat() != self._mtime:
+                await self.reload()
@@ -2,7 +2,10 @@ import logging
 import json
 import uuid
 import sys
+import queue
+import threading
 import discord
+from utils.log_segments import LogSegments
 
 class MinimalJsonFormatter(logging.Formatter):
     def format(self, record):
@@ -21,12 +24,145 @@ class MinimalJsonFormatter(logging.Formatter):
                 log_record[key] = record.__dict__[key]
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Already rendered by BatchingQueueHandler on the calling thread.
+            log_record["exception"] = record.exc_text
         return json.dumps(log_record)
 
-def setup_logging(log_file: str = "logs/bot.log") -> None:
+class BatchingQueueHandler(logging.Handler):
+    """
+    Logging handler that only enqueues records on the calling thread.
+
+    A background worker drains the bounded queue in batches, formats them and
+    writes each batch to the log segments and console in one call. Records
+    that arrive while the queue is full are dropped and counted instead of
+    blocking the event loop.
+    """
+
+    def __init__(self, log_file: str = None, max_queue_size: int = 10000, batch_size: int = 256,
+                 max_bytes: int = 0, backup_count: int = 5, console: bool = True,
+                 rotate_interval: float = 0, compress: bool = True):
+        super().__init__()
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self.batch_size = batch_size
+        self.log_file = log_file
+        self.console = console
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+        self.segments = None
+        if log_file:
+            try:
+                self.segments = LogSegments(log_file, max_bytes, rotate_interval, backup_count, compress)
+            except FileNotFoundError:
+                # Skip file output if the directory doesn't exist.
+                self.segments = None
+        self._worker = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._worker.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Resolve the message and exception text now so the record no longer
+        # references mutable arguments, but leave the JSON encoding to the worker.
+        try:
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info and not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self) -> None:
+        while True:
+            record = self.queue.get()
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            records = [r for r in batch if r is not None]
+            try:
+                self._write(records)
+            except Exception as e:
+                # A full disk or failed rotation must not end the writer thread;
+                # the records in this batch are lost and counted.
+                self.dropped += len(records)
+                self.write_errors += 1
+                sys.stderr.write(f"Async logging failed to write {len(records)} records: {e!r}\n")
+            if stop:
+                return
+
+    def _write(self, batch: list) -> None:
+        if not batch:
+            return
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        text = "\n".join(lines) + "\n"
+        if self.segments is not None:
+            self.segments.write(text)
+        if self.console:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        self.written += len(lines)
+
+    def stats(self) -> dict:
+        return {"queued": self.queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "write_errors": self.write_errors}
+
+    def close(self) -> None:
+        """Flush every queued record and stop the worker."""
+        if self._worker.is_alive():
+            # The stop sentinel must not be dropped, so block for it.
+            self.queue.put(None)
+            self._worker.join()
+            if self.segments is not None:
+                self.segments.close()
+            if self.dropped:
+                sys.stderr.write(f"Async logging dropped {self.dropped} records.\n")
+        super().close()
+
+class SegmentedFileHandler(logging.Handler):
+    """Synchronous file handler that writes to rotated, compressed log segments."""
+
+    def __init__(self, log_file: str, max_bytes: int = 0, backup_count: int = 5, rotate_interval: float = 0,
+                 compress: bool = True):
+        super().__init__()
+        self.segments = LogSegments(log_file, max_bytes, rotate_interval, backup_count, compress)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.segments.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self.segments.close()
+        finally:
+            self.release()
+        super().close()
+
+def setup_logging(log_file: str = "logs/bot.log", async_mode: bool = False, max_queue_size: int = 10000,
+                  max_bytes: int = 0, backup_count: int = 5, rotate_interval: float = 0,
+                  compress: bool = True) -> None:
     """
     Configure logging to output to both the console and a file in JSON format
     with minimal information.
+
+    With async_mode, records are handed to a BatchingQueueHandler so the event
+    loop never formats or writes log lines itself. In both modes the file is
+    rotated at max_bytes or every rotate_interval seconds, and rotated
+    segments are indexed and compressed for python -m utils.log_query.
     """
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
@@ -39,24 +175,44 @@ def setup_logging(log_file: str = "logs/bot.log") -> None:
         datefmt="%Y-%m-%d %H:%M:%S"
     )
 
-    try:
-        file_handler = logging.FileHandler(log_file, encoding="utf-8")
-        file_handler.setFormatter(formatter)
-        file_handler.setLevel(logging.INFO)
-        logger.addHandler(file_handler)
-    except FileNotFoundError:
-        # Skip file handler setup if the directory doesn't exist.
-        pass
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
-    logger.addHandler(console_handler)
+    if async_mode:
+        queue_handler = BatchingQueueHandler(
+            log_file,
+            max_queue_size=max_queue_size,
+            max_bytes=max_bytes,
+            backup_count=backup_count,
+            rotate_interval=rotate_interval,
+            compress=compress
+        )
+        queue_handler.setFormatter(formatter)
+        queue_handler.setLevel(logging.INFO)
+        logger.addHandler(queue_handler)
+    else:
+        try:
+            file_handler = SegmentedFileHandler(log_file, max_bytes, backup_count, rotate_interval, compress)
+            file_handler.setFormatter(formatter)
+            file_handler.setLevel(logging.INFO)
+            logger.addHandler(file_handler)
+        except FileNotFoundError:
+            # Skip file handler setup if the directory doesn't exist.
+            pass
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(formatter)
+        console_handler.setLevel(logging.INFO)
+        logger.addHandler(console_handler)
     
     # Reduce verbosity for noisy modules.
     logging.getLogger("discord.gateway").setLevel(logging.WARNING)
     logging.getLogger("wavelink").setLevel(logging.WARNING)
 
+def get_queue_handler() -> BatchingQueueHandler:
+    """Return the active BatchingQueueHandler, or None when logging is synchronous."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, BatchingQueueHandler):
+            return handler
+    return None
+
 def log_command_invocation(ctx: discord.ApplicationContext, command_name: str):
     """
     Log a command invocation with minimal context.
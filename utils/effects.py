@@ -0,0 +1,84 @@
+import copy
+import functools
+import typing
+import wavelink
+
+# Equalizer gains (band, gain) boosting the low end.
+BASS_BOOST_BANDS = [(0, 0.25), (1, 0.2), (2, 0.15), (3, 0.1), (4, 0.05)]
+
+PRESETS = {
+    "off": "No effects",
+    "nightcore": "Faster and higher pitched",
+    "bassboost": "Boosted bass",
+    "8d": "Audio rotating around the listener",
+    "karaoke": "Vocals filtered out",
+}
+
+def build_filters(preset: str, speed: typing.Optional[float] = None, pitch: typing.Optional[float] = None) -> wavelink.Filters:
+    """
+    Return the combined filters for a preset and optional speed/pitch override.
+    Each call gets its own copy, which the caller (or wavelink) may modify.
+    """
+    return copy.deepcopy(_preset_filters(preset, speed, pitch))
+
+@functools.lru_cache(maxsize=128)
+def _preset_filters(preset: str, speed: typing.Optional[float], pitch: typing.Optional[float]) -> wavelink.Filters:
+    """Build the filters once per combination; shared by every copy, so never handed out."""
+    filters = wavelink.Filters()
+    timescale = {}
+    if preset == "nightcore":
+        timescale = {"speed": 1.25, "pitch": 1.25}
+    elif preset == "bassboost":
+        filters.equalizer.set(bands=[{"band": band, "gain": gain} for band, gain in BASS_BOOST_BANDS])
+    elif preset == "8d":
+        filters.rotation.set(rotation_hz=0.2)
+    elif preset == "karaoke":
+        filters.karaoke.set(level=1.0, mono_level=1.0, filter_band=220.0, filter_width=100.0)
+
+    if speed is not None:
+        timescale["speed"] = speed
+    if pitch is not None:
+        timescale["pitch"] = pitch
+    if timescale:
+        filters.timescale.set(**timescale)
+    return filters
+
+class GuildEffects:
+    """The effects chosen in each guild, so they can be put back on new players and nodes."""
+
+    def __init__(self):
+        self._settings: dict[int, tuple[str, typing.Optional[float], typing.Optional[float]]] = {}
+
+    def set(self, guild_id: int, preset: str, speed: typing.Optional[float] = None,
+            pitch: typing.Optional[float] = None) -> wavelink.Filters:
+        if preset == "off" and speed is None and pitch is None:
+            self._settings.pop(guild_id, None)
+        else:
+            self._settings[guild_id] = (preset, speed, pitch)
+        return build_filters(preset, speed, pitch)
+
+    def get(self, guild_id: int) -> typing.Optional[wavelink.Filters]:
+        settings = self._settings.get(guild_id)
+        return build_filters(*settings) if settings else None
+
+    def describe(self, guild_id: int) -> str:
+        preset, speed, pitch = self._settings.get(guild_id, ("off", None, None))
+        parts = [PRESETS[preset]] if preset != "off" else []
+        if speed is not None:
+            parts.append(f"speed {speed:g}x")
+        if pitch is not None:
+            parts.append(f"pitch {pitch:g}x")
+        return ", ".join(parts) or PRESETS["off"]
+
+    def needs_reapply(self, player: wavelink.Player) -> typing.Optional[wavelink.Filters]:
+        """Return the guild's filters if the player lost them (new player or node), else None."""
+        filters = self.get(player.guild.id)
+        if filters is None or player.filters() == filters():
+            return None
+        return filters
+
+    def forget(self, guild_id: int) -> None:
+        self._settings.pop(guild_id, None)
+
+# Shared instance used by the music cogs.
+guild_effects = GuildEffects()
@@ -0,0 +1,183 @@
+import asyncio
+import collections
+import time
+import typing
+import wavelink
+from utils.metrics import metrics
+
+# Default per-guild command rate: tokens per second and bucket size.
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 5
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def consume(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class GuildScheduler:
+    """
+    Per-guild coordination for music commands.
+
+    - allow() rate limits commands with a token bucket per guild.
+    - lock() serializes player mutations (play, skip, track end) per guild.
+    - skip() collapses concurrent skips into a single one.
+    - update_player() sends a volume or filter change right away and merges the
+      changes arriving while it is in flight into one follow-up update, so
+      quick changes don't each cause an audible restart.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[int, TokenBucket] = {}
+        self._locks: collections.defaultdict = collections.defaultdict(asyncio.Lock)
+        self._skips: dict[int, asyncio.Future] = {}
+        self._updates: dict[int, tuple[dict, asyncio.Future]] = {}
+        self._updaters: dict[int, asyncio.Task] = {}
+        self.rate_limited = 0
+        self.calls_saved = 0
+
+    def configure(self, config: dict) -> None:
+        self.rate = config.get("RATE", self.rate)
+        self.burst = config.get("BURST", self.burst)
+        self._buckets.clear()
+
+    def allow(self, guild_id: int) -> bool:
+        bucket = self._buckets.get(guild_id)
+        if bucket is None:
+            bucket = self._buckets[guild_id] = TokenBucket(self.rate, self.burst)
+        if bucket.consume():
+            return True
+        self.rate_limited += 1
+        metrics.increment("commands_rate_limited_total")
+        return False
+
+    def lock(self, guild_id: int) -> asyncio.Lock:
+        return self._locks[guild_id]
+
+    def _saved(self, calls: int) -> None:
+        self.calls_saved += calls
+        metrics.increment("lavalink_calls_saved_total", calls)
+
+    def forget(self, guild_id: int) -> None:
+        """Drop the per-guild state once its player is gone."""
+        self._buckets.pop(guild_id, None)
+        lock = self._locks.get(guild_id)
+        if lock is not None and not lock.locked():
+            del self._locks[guild_id]
+
+    async def skip(self, player: wavelink.Player) -> tuple[typing.Optional[wavelink.Playable], typing.Optional[wavelink.Playable], bool]:
+        """
+        Skip the current track and start the next queued one.
+        Returns (skipped, next_track, collapsed); collapsed is True when this
+        call joined a skip that was already in progress.
+        """
+        guild_id = player.guild.id
+        pending = self._skips.get(guild_id)
+        if pending is not None:
+            skipped, next_track = await asyncio.shield(pending)
+            # The joined skip did the skip and possibly the play for us.
+            self._saved(2 if next_track else 1)
+            return skipped, next_track, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._skips[guild_id] = future
+        try:
+            async with self.lock(guild_id):
+                skipped = await player.skip(force=True)
+                metrics.increment("lavalink_player_updates_total")
+                next_track = None
+                if hasattr(player, "queue") and not player.queue.is_empty:
+                    next_track = player.queue.get()
+                    await player.play(next_track)
+                    metrics.increment("lavalink_player_updates_total")
+            future.set_result((skipped, next_track))
+            return skipped, next_track, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody joined this skip.
+            future.exception()
+            raise
+        finally:
+            self._skips.pop(guild_id, None)
+
+    async def set_volume(self, player: wavelink.Player, level: int) -> int:
+        """Request a volume change; returns the level that was finally applied."""
+        applied = await self.update_player(player, volume=level)
+        return applied.get("volume", level)
+
+    async def update_player(self, player: wavelink.Player, *,
+                            volume: typing.Optional[int] = None,
+                            filters: typing.Optional[wavelink.Filters] = None) -> dict:
+        """
+        Request a volume and/or filter change. The first change is sent right
+        away; changes arriving while it is in flight are merged, the latest
+        value of each winning, and sent as one update after it. Returns the
+        changes that were finally applied.
+        """
+        changes = {key: value for key, value in (("volume", volume), ("filters", filters)) if value is not None}
+        guild_id = player.guild.id
+        pending = self._updates.get(guild_id)
+        if pending is not None:
+            # Merge into the update waiting to be sent and share its result.
+            pending[0].update(changes)
+            self._saved(1)
+            return await asyncio.shield(pending[1])
+
+        future = asyncio.get_running_loop().create_future()
+        self._updates[guild_id] = (changes, future)
+        if guild_id not in self._updaters:
+            self._updaters[guild_id] = asyncio.create_task(self._send_updates(player, guild_id))
+        # Shielded so a cancelled command doesn't drop changes merged into this one.
+        return await asyncio.shield(future)
+
+    async def _send_updates(self, player: wavelink.Player, guild_id: int) -> None:
+        """Send the pending updates of a guild one at a time until none are left."""
+        try:
+            while (pending := self._updates.pop(guild_id, None)) is not None:
+                changes, future = pending
+                try:
+                    async with self.lock(guild_id):
+                        if hasattr(player, "update"):
+                            await player.update(**changes)
+                        else:
+                            if "filters" in changes:
+                                await player.set_filters(changes["filters"])
+                            if "volume" in changes:
+                                await player.set_volume(changes["volume"])
+                        metrics.increment("lavalink_player_updates_total")
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    future.set_exception(e)
+                    future.exception()
+                else:
+                    future.set_result(changes)
+        finally:
+            self._updaters.pop(guild_id, None)
+            pending = self._updates.pop(guild_id, None)
+            if pending is not None:
+                pending[1].cancel()
+
+    def stats(self) -> dict:
+        return {"rate_limited": self.rate_limited, "calls_saved": self.calls_saved}
+
+# Shared instance used by the music cogs; main.py configures it from config.json.
+guild_scheduler = GuildScheduler()
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import typing
+import discord
+import psutil
+import wavelink
+from utils.metrics import metrics
+from utils.track_index import TrackRecord, track_index
+
+# Seconds without a playing track before wavelink reports the player inactive and it disconnects.
+DEFAULT_DISCONNECT_AFTER = 60
+# Seconds a player may sit idle or paused before its queue is compacted.
+DEFAULT_COMPACT_AFTER = 30
+# Played tracks kept in each player's history.
+DEFAULT_HISTORY_LIMIT = 20
+# Seconds between sweeps over the connected players.
+DEFAULT_SWEEP_INTERVAL = 15
+# Players measured per sweep to estimate the memory held by each player.
+MEMORY_SAMPLE_SIZE = 50
+
+class CompactTrack:
+    """
+    A queued track reduced to its encoded string.
+
+    A track the track index knows shares the index's record (its encoded
+    string is the same object the Playable held), so compacting it copies
+    nothing; the info of any other track, e.g. one from a playlist, is kept
+    as JSON.
+    """
+
+    __slots__ = ("encoded", "record", "info")
+
+    def __init__(self, encoded: str, record: typing.Optional[TrackRecord] = None, info: typing.Optional[str] = None):
+        self.encoded = encoded
+        self.record = record
+        self.info = info
+
+    @classmethod
+    def from_playable(cls, track: wavelink.Playable) -> "CompactTrack":
+        record = track_index.records.get(track.encoded)
+        if record is not None:
+            return cls(record.encoded, record=record)
+        return cls(track.encoded, info=json.dumps(track.raw_data["info"], separators=(",", ":")))
+
+    def to_playable(self) -> wavelink.Playable:
+        if self.record is not None:
+            return self.record.to_playable()
+        return wavelink.Playable({"encoded": self.encoded, "info": json.loads(self.info), "pluginInfo": {}, "userData": {}})
+
+def deep_size(obj, seen: set) -> int:
+    """Approximate the bytes held by an object and everything it references."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, slot), seen) for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+def player_memory(player: wavelink.Player) -> int:
+    """Bytes held by a player's queue, history and compacted tracks."""
+    queue = getattr(player, "_queue", None)
+    if queue is None:
+        return 0
+    seen = set()
+    size = sum(deep_size(track, seen) for track in queue)
+    size += sum(deep_size(track, seen) for track in queue.history or ())
+    compacted = getattr(player, "compacted", None) or []
+    # Records shared with the track index aren't the player's to reclaim.
+    size += sys.getsizeof(compacted) + sum(sys.getsizeof(track) + deep_size(track.info, seen) for track in compacted)
+    return size
+
+class IdlePolicy:
+    """
+    Tiered reclamation for players that are not playing anything.
+
+    1. Every sweep, each player's history is trimmed to HISTORY_LIMIT tracks.
+    2. After COMPACT_AFTER seconds idle or paused, the queue is swapped for
+       CompactTrack records; the first access to player.queue rehydrates it.
+    3. After DISCONNECT_AFTER seconds with nothing playing, wavelink reports the
+       player inactive and the Play cog disconnects it.
+
+    Every sweep also samples a few players to estimate memory per player.
+    """
+
+    def __init__(self):
+        self.disconnect_after = DEFAULT_DISCONNECT_AFTER
+        self.compact_after = DEFAULT_COMPACT_AFTER
+        self.history_limit = DEFAULT_HISTORY_LIMIT
+        self.sweep_interval = DEFAULT_SWEEP_INTERVAL
+        self._idle_since: dict[int, float] = {}
+        self.players = 0
+        self.compacted_players = 0
+        self.bytes_per_player = 0.0
+        self.compactions = 0
+        self.rehydrations = 0
+
+    def configure(self, config: dict) -> None:
+        self.disconnect_after = config.get("DISCONNECT_AFTER", self.disconnect_after)
+        self.compact_after = config.get("COMPACT_AFTER", self.compact_after)
+        self.history_limit = config.get("HISTORY_LIMIT", self.history_limit)
+        self.sweep_interval = config.get("SWEEP_INTERVAL", self.sweep_interval)
+
+    def apply(self, player: wavelink.Player) -> None:
+        """Set up a newly connected player; reused players keep their running idle timer."""
+        player.inactive_timeout = self.disconnect_after or None
+
+    def forget(self, guild_id: int) -> None:
+        self._idle_since.pop(guild_id, None)
+
+    def sweep(self, players: list[wavelink.Player]) -> None:
+        now = time.monotonic()
+        compacted = 0
+        for player in players:
+            if player.guild is None or not hasattr(player, "compact"):
+                continue
+            player.trim_history(self.history_limit)
+            if player.playing and not player.paused:
+                self._idle_since.pop(player.guild.id, None)
+            else:
+                idle_since = self._idle_since.setdefault(player.guild.id, now)
+                if self.compact_after and now - idle_since >= self.compact_after and player.compact():
+                    self.compactions += 1
+                    metrics.increment("players_compacted_total")
+            if player.compacted is not None:
+                compacted += 1
+
+        self.players = len(players)
+        self.compacted_players = compacted
+        sample = random.sample(players, min(MEMORY_SAMPLE_SIZE, len(players)))
+        self.bytes_per_player = sum(player_memory(player) for player in sample) / len(sample) if sample else 0.0
+
+    async def run(self, bot: discord.Bot):
+        """Sweep the connected players until the bot closes."""
+        await bot.wait_until_ready()
+        while not bot.is_closed():
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep([player for player in bot.voice_clients if isinstance(player, wavelink.Player)])
+            except Exception as e:
+                logging.error(f"Idle player sweep failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "players": self.players,
+            "compacted": self.compacted_players,
+            "compactions": self.compactions,
+            "rehydrations": self.rehydrations,
+            "bytes_per_player": self.bytes_per_player,
+            "rss_bytes": psutil.Process().memory_info().rss,
+        }
+
+# Shared instance; main.py configures it from config.json.
+idle_policy = IdlePolicy()
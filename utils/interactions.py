@@ -0,0 +1,85 @@
+"""
+Interaction acknowledgement for slow slash commands.
+
+Discord drops an interaction that is not acknowledged within 3 seconds.
+Commands that talk to Lavalink or the voice gateway use @deferred, which
+acknowledges the interaction before the command does any work and records
+how long the acknowledgement and the final response took. Music commands
+are rate limited per guild before that, so the rejection can still be an
+ephemeral reply rather than a public follow-up to the deferral. Those commands
+reply through respond() and edit(), which fall back to plain channel
+messages if the interaction has already expired.
+"""
+import functools
+import logging
+import time
+import discord
+from utils import responses
+from utils.guild_scheduler import guild_scheduler
+from utils.metrics import metrics
+
+# Seconds Discord gives us to acknowledge an interaction.
+ACK_DEADLINE = 3.0
+
+# Interactions that expired before we could use them, and the channel
+# messages sent in their place (edited instead of the original response).
+_expired: set[int] = set()
+_fallback_messages: dict[int, discord.Message] = {}
+
+def _expire(ctx: discord.ApplicationContext) -> None:
+    _expired.add(ctx.interaction.id)
+    metrics.increment("interactions_expired_total")
+
+def deferred(ephemeral: bool = False, rate_limit: bool = False):
+    """
+    Acknowledge the interaction before running the command, and time both steps.
+    With rate_limit, a command over its guild's rate limit is turned away with
+    an ephemeral reply instead, without deferring or running it.
+    """
+    def decorator(callback):
+        @functools.wraps(callback)
+        async def wrapper(self, ctx: discord.ApplicationContext, *args, **kwargs):
+            name = ctx.command.qualified_name
+            if rate_limit and ctx.guild is not None and not guild_scheduler.allow(ctx.guild.id):
+                return await respond(ctx, responses.RATE_LIMITED, ephemeral=True)
+            start = time.perf_counter()
+            try:
+                await ctx.defer(ephemeral=ephemeral)
+                if metrics.enabled:
+                    metrics.observe(f"{name}.ack", time.perf_counter() - start)
+            except discord.NotFound:
+                _expire(ctx)
+                logging.warning(f"/{name} missed the {ACK_DEADLINE:g}s acknowledgement deadline, replying in the channel")
+            try:
+                return await callback(self, ctx, *args, **kwargs)
+            finally:
+                if metrics.enabled:
+                    metrics.observe(f"{name}.final", time.perf_counter() - start)
+                _expired.discard(ctx.interaction.id)
+                _fallback_messages.pop(ctx.interaction.id, None)
+        return wrapper
+    return decorator
+
+async def respond(ctx: discord.ApplicationContext, content=None, **kwargs):
+    """Send a response to the command, as a channel message if the interaction expired."""
+    if ctx.interaction.id not in _expired:
+        try:
+            return await ctx.respond(content, **kwargs)
+        except discord.NotFound:
+            _expire(ctx)
+    kwargs.pop("ephemeral", None)
+    message = await ctx.channel.send(content, **kwargs)
+    _fallback_messages[ctx.interaction.id] = message
+    return message
+
+async def edit(ctx: discord.ApplicationContext, **kwargs):
+    """Edit the command's response, or the channel message sent in its place."""
+    if ctx.interaction.id not in _expired:
+        try:
+            return await ctx.edit(**kwargs)
+        except discord.NotFound:
+            _expire(ctx)
+    message = _fallback_messages.get(ctx.interaction.id)
+    if message is None:
+        return await respond(ctx, **kwargs)
+    return await message.edit(**kwargs)
@@ -1,33 +1,349 @@
+import asyncio
+import functools
 import logging
+import typing
 import wavelink
 import discord
+from utils.idle_policy import CompactTrack, idle_policy
+from utils.effects import guild_effects
+from utils.voice_sessions import voice_sessions
+
+# Latest stats reported by each node, keyed on node identifier.
+node_stats: dict[str, typing.Any] = {}
+# Nodes that failed their last health check; no players are placed on them until they recover.
+unhealthy_nodes: set[str] = set()
+# Consecutive failed health checks of each node whose websocket is still up.
+failed_checks: dict[str, int] = {}
+# Failed stats checks in a row before the players of a node that is still
+# connected are moved off it; one slow answer (a GC pause, a network blip)
+# only keeps new players away. A closed websocket fails over right away.
+FAILOVER_AFTER = 3
+# Websocket reconnect attempts before wavelink gives up on a node. A node that
+# gave up is reconnected by the next config reload.
+DEFAULT_NODE_RETRIES = 5
+# Seconds a stats request may take before the node counts as unhealthy.
+STATS_TIMEOUT = 5.0
+# wavelink release series (pinned in requirements.txt) whose player internals
+# BalancedPlayer.update relies on; other versions use the public setters.
+PINNED_WAVELINK = "3.4."
+# Set once the first node is ready to serve players.
+pool_ready = asyncio.Event()
+
+def get_node_configs(lavalink_config: dict) -> list[dict]:
+    """
+    Return the list of node configs from the LAVALINK section.
+    Falls back to the single LAVALINK_HOST/PORT/PASSWORD keys when NODES is not set.
+    """
+    nodes = lavalink_config.get("NODES")
+    if not nodes:
+        nodes = [{
+            "IDENTIFIER": "Node1",
+            "LAVALINK_HOST": lavalink_config.get("LAVALINK_HOST", "http://127.0.0.1"),
+            "LAVALINK_PORT": lavalink_config.get("LAVALINK_PORT", 2333),
+            "LAVALINK_PASSWORD": lavalink_config.get("LAVALINK_PASSWORD"),
+        }]
+    return nodes
+
+def build_nodes(lavalink_config: dict) -> list[wavelink.Node]:
+    nodes = []
+    for index, node_config in enumerate(get_node_configs(lavalink_config), start=1):
+        host = node_config.get("LAVALINK_HOST", "http://127.0.0.1")
+        port = node_config.get("LAVALINK_PORT", 2333)
+        nodes.append(
+            wavelink.Node(
+                identifier=node_config.get("IDENTIFIER", f"Node{index}"),  # Unique identifier for the node
+                uri=f"{host}:{port}",  # Lavalink server URI (ensure protocol and port are correct)
+                password=node_config.get("LAVALINK_PASSWORD"),
+                retries=node_config.get("RETRIES", DEFAULT_NODE_RETRIES)
+            )
+        )
+    return nodes
 
 async def connect_nodes(bot: discord.Bot):
     """Connect to our Lavalink nodes."""
     await bot.wait_until_ready()  # Wait until the bot is ready
 
     lavalink_config = bot.config["LAVALINK"]
-    host = lavalink_config.get("LAVALINK_HOST", "http://127.0.0.1")
-    port = lavalink_config.get("LAVALINK_PORT", 2333)
-    password = lavalink_config.get("LAVALINK_PASSWORD")
-    uri = f"{host}:{port}"
-    nodes = [
-        wavelink.Node(
-            identifier="Node1",       # Unique identifier for the node
-            uri=uri,  # Lavalink server URI (ensure protocol and port are correct)
-            password=password
-        )
-    ]
+    nodes = build_nodes(lavalink_config)
 
     try:
         await wavelink.Pool.connect(nodes=nodes, client=bot)
-        logging.info("Lavalink nodes connected successfully.")
+        logging.info(f"Lavalink nodes connected successfully: {[node.identifier for node in nodes]}")
     except Exception as e:
         logging.error(f"Failed to connect Lavalink nodes: {e}")
+        return
+
+    interval = lavalink_config.get("STATS_INTERVAL", 30)
+    bot.loop.create_task(poll_node_stats(bot, interval))
+
+async def apply_node_configs(bot: discord.Bot, lavalink_config: dict):
+    """
+    Bring the pool in line with a reloaded LAVALINK section: connect new nodes
+    and close removed or changed ones. Closing a node fails its players over
+    to the remaining nodes through on_wavelink_node_closed. Nodes that ran out
+    of reconnect attempts are replaced too, so a reload reconnects them.
+    """
+    wanted = {node.identifier: node for node in build_nodes(lavalink_config)}
+    current = dict(wavelink.Pool.nodes)
+    stale = [
+        node for identifier, node in current.items()
+        if identifier not in wanted or node.uri != wanted[identifier].uri or node.password != wanted[identifier].password
+        or node.status is wavelink.NodeStatus.DISCONNECTED
+    ]
+    added = [node for identifier, node in wanted.items() if identifier not in current]
+    replaced = [wanted[node.identifier] for node in stale if node.identifier in wanted]
+
+    # New nodes first, so players on stale nodes have somewhere to go.
+    if added:
+        await wavelink.Pool.connect(nodes=added, client=bot)
+    for node in stale:
+        logging.info(f"Closing Lavalink node {node.identifier} removed or changed in the config")
+        node_stats.pop(node.identifier, None)
+        await node.close(eject=True)
+    if replaced:
+        await wavelink.Pool.connect(nodes=replaced, client=bot)
+    if added or stale:
+        logging.info(f"Lavalink nodes updated from config: {list(wavelink.Pool.nodes)}")
+
+def healthy_nodes() -> list[wavelink.Node]:
+    return [
+        node for node in wavelink.Pool.nodes.values()
+        if node.status is wavelink.NodeStatus.CONNECTED and node.identifier not in unhealthy_nodes
+    ]
+
+def node_penalty(node: wavelink.Node) -> float:
+    """
+    Score a node's load from its last reported stats, lower is better.
+    Mirrors Lavalink's own penalty formula: players, CPU load and frame deficit.
+    """
+    stats = node_stats.get(node.identifier)
+    if stats is None:
+        # No stats yet, fall back to the number of players we placed there.
+        return float(len(node.players))
+
+    penalty = float(stats.playing)
+    penalty += 1.05 ** (100 * stats.cpu.system_load) * 10 - 10
+    if stats.frames is not None:
+        penalty += 1.03 ** (500 * stats.frames.deficit / 3000) * 600 - 600
+        penalty += (1.03 ** (500 * stats.frames.nulled / 3000) * 300 - 300) * 2
+    # Account for players placed since the last stats poll.
+    penalty += max(0, len(node.players) - stats.players)
+    return penalty
+
+def best_node(exclude: typing.Optional[wavelink.Node] = None) -> wavelink.Node:
+    """Return the connected node with the lowest load."""
+    candidates = [node for node in healthy_nodes() if node is not exclude]
+    if not candidates:
+        raise wavelink.InvalidNodeException("No healthy Lavalink nodes are available.")
+    return min(candidates, key=node_penalty)
+
+def node_players(bot: discord.Bot, node: wavelink.Node) -> list[wavelink.Player]:
+    """Players attached to a node, including those wavelink already dropped after giving up on it."""
+    players = {id(player): player for player in node.players.values()}
+    for player in bot.voice_clients:
+        if isinstance(player, wavelink.Player) and player.node is node:
+            players.setdefault(id(player), player)
+    return list(players.values())
+
+def websocket_open(node: wavelink.Node) -> bool:
+    """Whether the node's websocket is up; wavelink still reports a node CONNECTED while it reconnects."""
+    websocket = getattr(node, "_websocket", None)
+    return node.status is wavelink.NodeStatus.CONNECTED and (websocket is None or websocket.is_connected())
+
+async def check_node(bot: discord.Bot, node: wavelink.Node) -> None:
+    """
+    Refresh a node's stats. A node whose websocket is down or that fails to
+    answer is marked unhealthy, and once its websocket is down or it failed
+    FAILOVER_AFTER checks in a row its players are moved to the other nodes:
+    wavelink keeps a node CONNECTED until its websocket heartbeat times out,
+    and only fires on_wavelink_node_closed for an explicit close.
+    """
+    closed = not websocket_open(node)
+    try:
+        if closed:
+            raise ConnectionError("websocket is closed")
+        stats = await asyncio.wait_for(node.fetch_stats(), timeout=STATS_TIMEOUT)
+    except Exception as e:
+        # Stale stats would make a dead node look lightly loaded.
+        node_stats.pop(node.identifier, None)
+        failures = failed_checks[node.identifier] = failed_checks.get(node.identifier, 0) + 1
+        if node.identifier not in unhealthy_nodes:
+            unhealthy_nodes.add(node.identifier)
+            logging.error(f"Lavalink node {node.identifier} is unhealthy: {e or type(e).__name__}")
+        if closed or failures >= FAILOVER_AFTER:
+            # Players already moved are no longer on the node, so repeating this is cheap.
+            await fail_over(node, node_players(bot, node))
+        return
+    node_stats[node.identifier] = stats
+    failed_checks.pop(node.identifier, None)
+    if node.identifier in unhealthy_nodes:
+        unhealthy_nodes.discard(node.identifier)
+        logging.info(f"Lavalink node {node.identifier} recovered")
+
+async def poll_node_stats(bot: discord.Bot, interval: float):
+    """Periodically check every node's health and refresh the stats used for player placement."""
+    while True:
+        await asyncio.gather(*(check_node(bot, node) for node in list(wavelink.Pool.nodes.values())))
+        await asyncio.sleep(interval)
+
+class TrackQueue(wavelink.Queue):
+    """
+    A wavelink.Queue that counts its changes, so anything rendered from it
+    (like /queue pages) can tell it is stale even when its length and ends
+    are unchanged, e.g. after a swap or a replaced entry in the middle.
+    """
+
+    def __init__(self, *, history: bool = True) -> None:
+        super().__init__(history=history)
+        self.version = 0
+
+    @classmethod
+    def adopt(cls, queue: wavelink.Queue) -> "TrackQueue":
+        """Take over a plain queue's tracks, history and mode."""
+        adopted = cls(history=False)
+        adopted._items = list(queue)
+        adopted._history = queue.history
+        adopted.mode = queue.mode
+        return adopted
+
+    async def put_wait(self, *args, **kwargs) -> int:
+        try:
+            return await super().put_wait(*args, **kwargs)
+        finally:
+            self.version += 1
+
+def _counting(name: str):
+    method = getattr(wavelink.Queue, name)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.version += 1
+    return wrapper
+
+# Every synchronous wavelink.Queue method that changes the tracks.
+for _name in ("__setitem__", "__delitem__", "get", "get_at", "put_at", "put", "delete", "swap", "shuffle",
+              "clear", "reset", "remove"):
+    setattr(TrackQueue, _name, _counting(_name))
+
+class BalancedPlayer(wavelink.Player):
+    """
+    A wavelink.Player that is created on the least loaded node.
+
+    Its queue can be compacted into CompactTrack records while the player is
+    idle; the next access to player.queue rebuilds the playable tracks.
+    """
+
+    # Compacted queue of an idle player, or None while the queue is live.
+    compacted: typing.Optional[list[CompactTrack]] = None
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("nodes", [best_node()])
+        super().__init__(*args, **kwargs)
+        logging.info(f"Placed player for guild {self.guild.id if self.guild else 'N/A'} on node {self.node.identifier}")
+
+    @property
+    def queue(self) -> wavelink.Queue:
+        if self.compacted is not None:
+            compacted, self.compacted = self.compacted, None
+            self._queue.put([track.to_playable() for track in compacted])
+            idle_policy.rehydrations += 1
+        return self._queue
+
+    @queue.setter
+    def queue(self, queue: wavelink.Queue) -> None:
+        self._queue = queue if isinstance(queue, TrackQueue) else TrackQueue.adopt(queue)
+        self.compacted = None
+
+    def compact(self) -> bool:
+        """Swap the queued tracks for compact records; returns False if there was nothing to compact."""
+        if self.compacted is not None or self._queue.is_empty:
+            return False
+        compacted = [CompactTrack.from_playable(track) for track in self._queue]
+        self._queue.clear()
+        self.compacted = compacted
+        return True
+
+    async def update(self, *, volume: typing.Optional[int] = None,
+                     filters: typing.Optional[wavelink.Filters] = None) -> None:
+        """Send a volume and filter change to Lavalink in a single player update."""
+        data = {}
+        if volume is not None:
+            data["volume"] = max(min(volume, 1000), 0)
+        if filters is not None:
+            data["filters"] = filters()
+        if not data:
+            return
+        if not hasattr(self.node, "_update_player") or not wavelink.__version__.startswith(PINNED_WAVELINK):
+            # The single update relies on wavelink internals; on other versions use the public calls.
+            if filters is not None:
+                await self.set_filters(filters)
+            if volume is not None:
+                await self.set_volume(volume)
+            return
+        # wavelink has no public call that sends both at once, so use the same
+        # update its set_volume and set_filters use and keep its state in step.
+        await self.node._update_player(self.guild.id, data=data)
+        if volume is not None:
+            self._volume = data["volume"]
+        if filters is not None:
+            self._filters = filters
+
+    def trim_history(self, limit: int) -> None:
+        history = self._queue.history
+        while history is not None and len(history) > limit:
+            history.delete(0)
+
+async def move_player(player: wavelink.Player, dead_node: wavelink.Node):
+    """Move a player off a dead node and resume its track at the same position."""
+    guild = player.guild
+    channel = player.channel
+    current = player.current
+    position = player.position
+    volume = player.volume
+    queue = getattr(player, "queue", None)
+
+    new_node = best_node(exclude=dead_node)
+    if player.connected and hasattr(player, "switch_node"):
+        await player.switch_node(new_node)
+    else:
+        if channel is None:
+            logging.error(f"Cannot move player for guild {guild.id}: no voice channel to rejoin.")
+            return
+        if player.connected:
+            # wavelink before 3.5 can't switch a player's node, so rejoin the channel on the new one.
+            await voice_sessions.disconnect(player)
+        # Replaces the stale player on the least loaded healthy node;
+        # handshakes are capped and retried with backoff.
+        player, _ = await voice_sessions.connect(channel, cls=BalancedPlayer, move=False)
+        if queue is not None:
+            player.queue = queue
+        idle_policy.apply(player)
+        if current is not None:
+            await player.play(current, start=position, volume=volume, filters=guild_effects.get(guild.id))
+    logging.info(f"Moved player for guild {guild.id} from node {dead_node.identifier} to node {new_node.identifier} at {position}ms")
+
+async def fail_over(node: wavelink.Node, players: list[wavelink.Player]) -> None:
+    """Move every player off a closed or unhealthy node."""
+    results = await asyncio.gather(*(move_player(player, node) for player in players), return_exceptions=True)
+    for player, result in zip(players, results):
+        if isinstance(result, Exception):
+            logging.error(f"Failed to move player for guild {player.guild.id} off node {node.identifier}: {result}")
 
 def register_node_ready_listener(bot: discord.Bot):
-    """Register an event listener to log when a Lavalink node is ready."""
+    """Register event listeners to log node readiness and fail over players from closed nodes."""
     @bot.event
     async def on_wavelink_node_ready(payload: wavelink.NodeReadyEventPayload):
-        logging.info(f"Node with ID {payload.session_id} has connected")
+        logging.info(f"Node {payload.node.identifier} with ID {payload.session_id} has connected")
         logging.info(f"Resumed session: {payload.resumed}")
+        pool_ready.set()
+
+    @bot.event
+    async def on_wavelink_node_closed(node: wavelink.Node, disconnected: list[wavelink.Player]):
+        logging.error(f"Node {node.identifier} closed with {len(disconnected)} players attached")
+        node_stats.pop(node.identifier, None)
+        unhealthy_nodes.discard(node.identifier)
+        failed_checks.pop(node.identifier, None)
+        await fail_over(node, disconnected)
@@ -0,0 +1,174 @@
+"""
+Search and summarize the JSON bot log across its rotated segments.
+
+Usage:
+    python -m utils.log_query search [--guild ID] [--user ID] [--command NAME] [--level LEVEL]
+                                     [--since TIME] [--until TIME] [--limit N]
+    python -m utils.log_query report [--guild ID] [--since TIME] [--until TIME] [--top N]
+
+TIME is "YYYY-MM-DD", "YYYY-MM-DD HH" or "YYYY-MM-DD HH:MM[:SS]" in the log's
+local time; --since is inclusive and --until exclusive. Rotated segments
+whose sidecar index can't match the filters are skipped without being
+decompressed, and reports are built from the indexes alone; only the
+active log file is scanned in full.
+"""
+import argparse
+import collections
+import json
+import os
+import typing
+from utils.log_segments import build_index, load_index, open_segment, segment_paths
+
+DEFAULT_LOG_FILE = "logs/bot.log"
+
+class Filters:
+    def __init__(self, guild_id: typing.Optional[int] = None, user_id: typing.Optional[int] = None,
+                 command: typing.Optional[str] = None, level: typing.Optional[str] = None,
+                 since: typing.Optional[str] = None, until: typing.Optional[str] = None):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.command = command
+        self.level = level.upper() if level else None
+        self.since = since
+        self.until = until
+        # Cheap substring checks that rule out most lines before they are parsed.
+        self._needles = [needle for needle in (
+            f'"guild_id": {guild_id}' if guild_id is not None else None,
+            f'"user_id": {user_id}' if user_id is not None else None,
+            f'"command": {json.dumps(command)}' if command is not None else None,
+            f'"level": "{self.level}"' if self.level else None,
+        ) if needle]
+
+    def skip_segment(self, index: dict) -> bool:
+        """Whether the segment's index rules out any matching line."""
+        if index["start"] is None:
+            return True
+        if self.since and index["end"] < self.since:
+            return True
+        if self.until and index["start"] >= self.until:
+            return True
+        if self.guild_id is not None and self.guild_id not in index["guilds"]:
+            return True
+        if self.user_id is not None and self.user_id not in index["users"]:
+            return True
+        return self.command is not None and self.command not in index["commands"]
+
+    def match(self, line: str) -> bool:
+        if not all(needle in line for needle in self._needles):
+            return False
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return False
+        stamp = entry.get("time", "")
+        return ((self.guild_id is None or entry.get("guild_id") == self.guild_id)
+                and (self.user_id is None or entry.get("user_id") == self.user_id)
+                and (self.command is None or entry.get("command") == self.command)
+                and (self.level is None or entry.get("level") == self.level)
+                and (not self.since or stamp >= self.since)
+                and (not self.until or stamp < self.until))
+
+def search(log_file: str, filters: Filters) -> typing.Iterator[str]:
+    """Stream the matching lines, oldest first."""
+    for path in segment_paths(log_file):
+        if filters.skip_segment(load_index(path)):
+            continue
+        with open_segment(path) as f:
+            for line in f:
+                if filters.match(line):
+                    yield line.rstrip("\n")
+    if os.path.exists(log_file):
+        with open_segment(log_file) as f:
+            for line in f:
+                if filters.match(line):
+                    yield line.rstrip("\n")
+
+def report(log_file: str, guild_id: typing.Optional[int] = None, since: typing.Optional[str] = None,
+           until: typing.Optional[str] = None) -> dict:
+    """Hourly line, error and per-guild command counts over the segments' indexes."""
+    indexes = [load_index(path) for path in segment_paths(log_file)]
+    if os.path.exists(log_file):
+        with open_segment(log_file) as f:
+            indexes.append(build_index(f))
+
+    hours: collections.defaultdict = collections.defaultdict(lambda: {"lines": 0, "errors": 0})
+    commands = collections.Counter()
+    command_errors = collections.Counter()
+    invocations = collections.Counter()
+    for index in indexes:
+        for hour, counts in index["hours"].items():
+            # Counts are per hour, so an hour that overlaps the range is kept whole.
+            if (since and hour < since[:13]) or (until and f"{hour}:00:00" >= until):
+                continue
+            hours[hour]["lines"] += counts["lines"]
+            hours[hour]["errors"] += counts["errors"]
+            for guild, per_command in counts["commands"].items():
+                if guild_id is None or guild == str(guild_id):
+                    for command, count in per_command.items():
+                        commands[(hour, guild, command)] += count
+                        invocations[command] += count
+            for guild, per_command in counts["command_errors"].items():
+                if guild_id is None or guild == str(guild_id):
+                    command_errors.update(per_command)
+    return {
+        "hours": dict(sorted(hours.items())),
+        "commands": commands,
+        "invocations": invocations,
+        "command_errors": command_errors,
+    }
+
+def print_report(result: dict, top: int) -> None:
+    print("hour           lines  errors  error rate")
+    for hour, counts in result["hours"].items():
+        rate = counts["errors"] / counts["lines"] if counts["lines"] else 0.0
+        print(f"{hour}  {counts['lines']:>6}  {counts['errors']:>6}  {rate:>9.2%}")
+
+    print(f"\ncommands per guild per hour (top {top})")
+    print("hour           guild                 command            count")
+    for (hour, guild, command), count in result["commands"].most_common(top):
+        print(f"{hour}  {guild:<20}  {command:<17}  {count:>5}")
+
+    print("\ncommand            invocations  errors  error rate")
+    for command in sorted(set(result["invocations"]) | set(result["command_errors"])):
+        calls, errors = result["invocations"][command], result["command_errors"][command]
+        rate = errors / calls if calls else 0.0
+        print(f"{command:<17}  {calls:>11}  {errors:>6}  {rate:>9.2%}")
+
+def normalize_time(value: str) -> str:
+    """Accept a date or a date with part of a time, in the log's "YYYY-MM-DD HH:MM:SS" form."""
+    value = value.strip().replace("T", " ")
+    if len(value) not in (10, 13, 16, 19):
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD[ HH[:MM[:SS]]], got {value!r}")
+    return value
+
+def main(argv: typing.Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m utils.log_query", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--log-file", default=DEFAULT_LOG_FILE)
+    commands = parser.add_subparsers(dest="action", required=True)
+
+    search_parser = commands.add_parser("search", help="print matching log lines")
+    search_parser.add_argument("--user", type=int)
+    search_parser.add_argument("--command")
+    search_parser.add_argument("--level")
+    search_parser.add_argument("--limit", type=int, default=0)
+
+    report_parser = commands.add_parser("report", help="commands per guild per hour and error rates")
+    report_parser.add_argument("--top", type=int, default=20)
+
+    for sub in (search_parser, report_parser):
+        sub.add_argument("--guild", type=int)
+        sub.add_argument("--since", type=normalize_time)
+        sub.add_argument("--until", type=normalize_time)
+
+    args = parser.parse_args(argv)
+    if args.action == "search":
+        filters = Filters(args.guild, args.user, args.command, args.level, args.since, args.until)
+        for count, line in enumerate(search(args.log_file, filters), 1):
+            print(line)
+            if args.limit and count >= args.limit:
+                break
+    else:
+        print_report(report(args.log_file, args.guild, args.since, args.until), args.top)
+
+if __name__ == "__main__":
+    main()
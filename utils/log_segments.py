@@ -0,0 +1,212 @@
+"""
+Rotated, compressed and indexed segments of the JSON bot log.
+
+The active log file is rotated once it reaches max_bytes or when the rotate
+interval (aligned to UTC) rolls over. A rotated segment is renamed with its
+rotation time, indexed and gzipped by a background thread, and the oldest
+segments beyond backup_count are deleted. Each segment's sidecar index
+(<segment>.idx.json) records its time range, the guilds, users and commands
+it mentions, and hourly command and error counts, so queries and reports
+can skip segments without decompressing them.
+"""
+import collections
+import glob
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import typing
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx.json"
+# Levels counted as errors in the index and reports.
+ERROR_LEVELS = frozenset({"ERROR", "CRITICAL"})
+
+def segment_paths(log_file: str) -> list[str]:
+    """Rotated segments of log_file, oldest first (rotation times sort by name)."""
+    paths = [path for path in glob.glob(f"{glob.escape(log_file)}.*")
+             if not path.endswith((INDEX_SUFFIX, ".tmp"))]
+    return sorted(paths, key=lambda path: path.removesuffix(".gz"))
+
+def index_path(segment: str) -> str:
+    return segment.removesuffix(".gz") + INDEX_SUFFIX
+
+def open_segment(path: str) -> typing.TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+def build_index(lines: typing.Iterable[str]) -> dict:
+    """Index the JSON log lines of one segment; lines that aren't JSON only count towards the totals."""
+    guilds, users, commands = set(), set(), set()
+    hours: collections.defaultdict = collections.defaultdict(
+        lambda: {"lines": 0, "errors": 0, "commands": {}, "command_errors": {}})
+    start = end = None
+    total = 0
+    for line in lines:
+        total += 1
+        try:
+            entry = json.loads(line)
+            stamp = entry["time"]
+        except (ValueError, KeyError, TypeError):
+            continue
+        start = stamp if start is None or stamp < start else start
+        end = stamp if end is None or stamp > end else end
+        hour = hours[stamp[:13]]
+        hour["lines"] += 1
+        is_error = entry.get("level") in ERROR_LEVELS
+        if is_error:
+            hour["errors"] += 1
+        guild_id, user_id, command = entry.get("guild_id"), entry.get("user_id"), entry.get("command")
+        if guild_id is not None:
+            guilds.add(guild_id)
+        if user_id is not None:
+            users.add(user_id)
+        if command is None:
+            continue
+        commands.add(command)
+        per_guild = hour["command_errors" if is_error else "commands"].setdefault(
+            str(guild_id) if guild_id is not None else "dm", {})
+        per_guild[command] = per_guild.get(command, 0) + 1
+    return {
+        "version": INDEX_VERSION,
+        "start": start,
+        "end": end,
+        "lines": total,
+        "guilds": sorted(guilds),
+        "users": sorted(users),
+        "commands": sorted(commands),
+        "hours": dict(hours),
+    }
+
+def read_index(segment: str) -> typing.Optional[dict]:
+    try:
+        with open(index_path(segment), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("version") == INDEX_VERSION else None
+
+def write_index(segment: str, index: dict) -> None:
+    path = index_path(segment)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(f"{path}.tmp", path)
+
+def load_index(segment: str) -> dict:
+    """The segment's sidecar index, built and saved first if it is missing or outdated."""
+    index = read_index(segment)
+    if index is None:
+        with open_segment(segment) as f:
+            index = build_index(f)
+        write_index(segment, index)
+    return index
+
+def compact_segment(segment: str) -> str:
+    """Index and gzip a rotated plain-text segment; returns the compressed path."""
+    if segment.endswith(".gz"):
+        return segment
+    if read_index(segment) is None:
+        with open(segment, "r", encoding="utf-8", errors="replace") as f:
+            write_index(segment, build_index(f))
+    compressed = f"{segment}.gz"
+    # Write under a temporary name so an interrupted run never leaves a truncated .gz.
+    with open(segment, "rb") as source, gzip.open(f"{compressed}.tmp", "wb") as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(f"{compressed}.tmp", compressed)
+    os.remove(segment)
+    return compressed
+
+class LogSegments:
+    """
+    The active log file and its rotated segments.
+
+    write() is called by one thread at a time (the log handler serializes
+    it). Rotation itself is a rename; indexing and compression happen on a
+    log-compactor thread so neither the event loop nor the log writer waits
+    for gzip.
+    """
+
+    def __init__(self, log_file: str, max_bytes: int = 0, rotate_interval: float = 0, backup_count: int = 5,
+                 compress: bool = True):
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self.rotations = 0
+        self._compactors: list[threading.Thread] = []
+        self._file = open(log_file, "a", encoding="utf-8", buffering=1024 * 1024)
+        # An existing file continues the period it was last written in.
+        self._period = self._period_of(os.path.getmtime(log_file) if self._file.tell() else time.time())
+        # Finish segments left uncompressed by an earlier run.
+        pending = [path for path in segment_paths(log_file) if not path.endswith(".gz")]
+        if pending and compress:
+            self._start_compactor(pending)
+
+    def _period_of(self, timestamp: float) -> int:
+        return int(timestamp // self.rotate_interval) if self.rotate_interval else 0
+
+    def write(self, text: str) -> None:
+        if self.rotate_interval and self._period_of(time.time()) != self._period and self._file.tell():
+            self.rotate()
+        self._file.write(text)
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self) -> None:
+        self._file.close()
+        if self.backup_count > 0:
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+            segment = f"{self.log_file}.{stamp}"
+            suffix = 1
+            while os.path.exists(segment) or os.path.exists(f"{segment}.gz"):
+                suffix += 1
+                segment = f"{self.log_file}.{stamp}-{suffix:03d}"
+            os.replace(self.log_file, segment)
+        else:
+            segment = None
+            os.remove(self.log_file)
+        self._file = open(self.log_file, "a", encoding="utf-8", buffering=1024 * 1024)
+        self._period = self._period_of(time.time())
+        self.rotations += 1
+        self._prune()
+        if segment is not None and self.compress:
+            self._start_compactor([segment])
+
+    def _prune(self) -> None:
+        segments = segment_paths(self.log_file)
+        for segment in segments[:max(0, len(segments) - self.backup_count)]:
+            for path in (segment, index_path(segment)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _start_compactor(self, segments: list[str]) -> None:
+        self._compactors = [thread for thread in self._compactors if thread.is_alive()]
+        thread = threading.Thread(target=self._compact, args=(segments,), name="log-compactor", daemon=True)
+        thread.start()
+        self._compactors.append(thread)
+
+    @staticmethod
+    def _compact(segments: list[str]) -> None:
+        for segment in segments:
+            try:
+                compact_segment(segment)
+            except FileNotFoundError:
+                # Pruned before we got to it.
+                pass
+            except Exception as e:
+                # Logging from here could rotate again; report on stderr instead.
+                sys.stderr.write(f"Failed to compress log segment {segment}: {e}\n")
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Close the active file and give running compressions time to finish."""
+        self._file.close()
+        for thread in self._compactors:
+            thread.join(timeout)
@@ -0,0 +1,129 @@
+import collections
+import contextlib
+import logging
+import time
+import typing
+from aiohttp import web
+
+# Number of recent samples kept per stage for percentile estimates.
+RESERVOIR_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+class LatencyHistogram:
+    """Recent latency samples for one stage plus lifetime count and sum."""
+
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self):
+        self.samples: collections.deque = collections.deque(maxlen=RESERVOIR_SIZE)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+# Returned by Metrics.timer when metrics are disabled.
+_NULL_TIMER = contextlib.nullcontext()
+
+class Metrics:
+    """
+    Process-wide latency histograms and counters.
+
+    Stages are free-form names such as "play.search". When disabled, timer()
+    returns a shared no-op context manager and increment() returns right away.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.counters: collections.Counter = collections.Counter()
+        # Callables returning extra gauges at scrape time, e.g. gateway latency.
+        self.gauges: dict[str, typing.Callable[[], float]] = {}
+
+    def timer(self, stage: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += amount
+
+    def summary(self) -> dict:
+        return {
+            "stages": {
+                stage: {"count": histogram.count, **{f"p{int(q * 100)}": value for q, value in histogram.quantiles().items()}}
+                for stage, histogram in sorted(self.histograms.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": {name: gauge() for name, gauge in sorted(self.gauges.items())},
+        }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        if self.histograms:
+            lines.append("# TYPE dave_stage_latency_seconds summary")
+        for stage, histogram in sorted(self.histograms.items()):
+            for q, value in histogram.quantiles().items():
+                lines.append(f'dave_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'dave_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'dave_stage_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE dave_{name} counter")
+            lines.append(f"dave_{name} {value}")
+        for name, gauge in sorted(self.gauges.items()):
+            lines.append(f"# TYPE dave_{name} gauge")
+            lines.append(f"dave_{name} {gauge():.6f}")
+        return "\n".join(lines) + "\n"
+
+async def start_metrics_server(host: str = "127.0.0.1", port: int = 9102) -> typing.Optional[web.AppRunner]:
+    """Serve /metrics for a local Prometheus scraper. Returns None if the port can't be bound."""
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logging.error(f"Failed to serve metrics on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
+
+# Shared instance used across the bot; main.py configures it from config.json.
+metrics = Metrics(enabled=False)
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import typing
+import discord
+import wavelink
+from utils import lavalink_manager
+from utils.idle_policy import idle_policy
+from utils.voice_sessions import voice_sessions
+
+DEFAULT_DB_PATH = "data/players.db"
+# Seconds between flushes of dirty player state to disk.
+DEFAULT_FLUSH_INTERVAL = 5
+# Number of guilds restored at the same time after a restart.
+RESTORE_CONCURRENCY = 25
+
+class PlayerStore:
+    """
+    SQLite store holding one row per guild: voice channel, volume, the current
+    track and its position, and the queue. Tracks are kept as their compact
+    Lavalink payloads so they can be rebuilt without another search.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS guild_state ("
+            " guild_id INTEGER PRIMARY KEY,"
+            " channel_id INTEGER NOT NULL,"
+            " volume INTEGER NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " current TEXT,"
+            " queue TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def save(self, states: list[dict]) -> None:
+        """Insert or replace the given guild states in one transaction."""
+        rows = [
+            (
+                state["guild_id"],
+                state["channel_id"],
+                state["volume"],
+                state["position"],
+                json.dumps(state["current"], separators=(",", ":")) if state["current"] else None,
+                json.dumps(state["queue"], separators=(",", ":")),
+                state["updated_at"],
+            )
+            for state in states
+        ]
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO guild_state VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def update_positions(self, positions: list[dict]) -> None:
+        """Update only the position and volume of guilds already saved, leaving their queues as written."""
+        rows = [(state["position"], state["volume"], state["updated_at"], state["guild_id"]) for state in positions]
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE guild_state SET position = ?, volume = ?, updated_at = ? WHERE guild_id = ?", rows
+            )
+
+    def delete(self, guild_ids: typing.Iterable[int]) -> None:
+        with self._conn:
+            self._conn.executemany("DELETE FROM guild_state WHERE guild_id = ?", [(guild_id,) for guild_id in guild_ids])
+
+    def load_all(self) -> list[dict]:
+        cursor = self._conn.execute(
+            "SELECT guild_id, channel_id, volume, position, current, queue, updated_at FROM guild_state"
+        )
+        return [
+            {
+                "guild_id": guild_id,
+                "channel_id": channel_id,
+                "volume": volume,
+                "position": position,
+                "current": json.loads(current) if current else None,
+                "queue": json.loads(queue),
+                "updated_at": updated_at,
+            }
+            for guild_id, channel_id, volume, position, current, queue, updated_at in cursor
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+
+def snapshot(player: wavelink.Player) -> typing.Optional[dict]:
+    """Capture a player's state, or None if there is nothing worth restoring."""
+    queue = getattr(player, "queue", None)
+    if not player.connected or player.channel is None or (player.current is None and (queue is None or queue.is_empty)):
+        return None
+    return {
+        "guild_id": player.guild.id,
+        "channel_id": player.channel.id,
+        "volume": player.volume,
+        "position": player.position,
+        "current": player.current.raw_data if player.current else None,
+        # raw_data is the payload Lavalink sent us, so this only copies references.
+        "queue": [track.raw_data for track in queue] if queue is not None else [],
+        "updated_at": time.time(),
+    }
+
+def position_snapshot(player: wavelink.Player) -> typing.Optional[dict]:
+    """Capture only what a position tick changes, or None if the player is gone."""
+    if not player.connected or player.guild is None:
+        return None
+    return {
+        "guild_id": player.guild.id,
+        "volume": player.volume,
+        "position": player.position,
+        "updated_at": time.time(),
+    }
+
+class PlayerStateTracker:
+    """
+    Coalesces player changes and writes them to a PlayerStore in batches.
+
+    Cogs call mark_dirty whenever a player's queue, track or volume changes,
+    and mark_moved when only its position advanced; every flush interval the
+    dirty players are snapshotted on the loop and written in a worker thread.
+    Players that only moved get their position and volume updated in place
+    instead of rewriting their queue.
+    """
+
+    def __init__(self):
+        self.store: typing.Optional[PlayerStore] = None
+        # A None player means the guild's saved state should be deleted.
+        self._dirty: dict[int, typing.Optional[wavelink.Player]] = {}
+        self._moved: dict[int, wavelink.Player] = {}
+        self._write_lock = asyncio.Lock()
+        self._restore_lock = asyncio.Lock()
+        self._opened = asyncio.Event()
+        self.flushes = 0
+        self.rows_written = 0
+        self.positions_written = 0
+
+    async def run(self, bot: discord.Bot):
+        """Open the store and flush dirty players until the bot closes."""
+        state_config = bot.config.get("PLAYER_STATE", {})
+        interval = state_config.get("FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+        if not await self.open(state_config.get("PATH", DEFAULT_DB_PATH)):
+            return
+
+        try:
+            while not bot.is_closed():
+                await asyncio.sleep(interval)
+                await self.flush()
+        finally:
+            await self.flush()
+
+    async def open(self, path: str) -> bool:
+        """Open the store; restores wait for this to finish, whether it succeeds or not."""
+        try:
+            self.store = await asyncio.to_thread(PlayerStore, path)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to open player state store {path}: {e}")
+            return False
+        finally:
+            self._opened.set()
+        return True
+
+    def mark_dirty(self, player: wavelink.Player) -> None:
+        if player is not None and player.guild is not None:
+            self._dirty[player.guild.id] = player
+            self._moved.pop(player.guild.id, None)
+
+    def mark_moved(self, player: wavelink.Player) -> None:
+        """Note that only the player's position changed since it was last marked dirty."""
+        if player is not None and player.guild is not None and player.guild.id not in self._dirty:
+            self._moved[player.guild.id] = player
+
+    def forget(self, guild_id: int) -> None:
+        """Drop a guild's saved state, e.g. after an intentional disconnect."""
+        self._dirty[guild_id] = None
+        self._moved.pop(guild_id, None)
+
+    async def flush(self) -> None:
+        if self.store is None or not (self._dirty or self._moved):
+            return
+        dirty, self._dirty = self._dirty, {}
+        moved, self._moved = self._moved, {}
+        states, removed = [], []
+        for guild_id, player in dirty.items():
+            state = snapshot(player) if player is not None else None
+            if state is None:
+                removed.append(guild_id)
+            else:
+                states.append(state)
+        positions = [state for state in map(position_snapshot, moved.values()) if state is not None]
+
+        async with self._write_lock:
+            try:
+                if states:
+                    await asyncio.to_thread(self.store.save, states)
+                if positions:
+                    await asyncio.to_thread(self.store.update_positions, positions)
+                if removed:
+                    await asyncio.to_thread(self.store.delete, removed)
+            except sqlite3.Error as e:
+                logging.error(f"Failed to write player state: {e}")
+                return
+        self.flushes += 1
+        self.rows_written += len(states) + len(removed)
+        self.positions_written += len(positions)
+
+    async def restore_all(self, bot: discord.Bot) -> int:
+        """Reconnect every saved guild that has no player yet. Returns the number restored."""
+        await self._opened.wait()
+        if self.store is None:
+            return 0
+        # Every node that becomes ready triggers a restore, only let one run at a time.
+        async with self._restore_lock:
+            return await self._restore_all(bot)
+
+    async def _restore_all(self, bot: discord.Bot) -> int:
+        start = time.perf_counter()
+        # The connection is shared with flush(), so never use it from two threads at once.
+        async with self._write_lock:
+            states = await asyncio.to_thread(self.store.load_all)
+        states = [state for state in states if not self._has_player(bot, state["guild_id"])]
+        if not states:
+            return 0
+
+        semaphore = asyncio.Semaphore(RESTORE_CONCURRENCY)
+
+        async def restore(state: dict) -> bool:
+            async with semaphore:
+                try:
+                    return await self._restore_one(bot, state)
+                except Exception as e:
+                    logging.error(f"Failed to restore player for guild {state['guild_id']}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(restore(state) for state in states))
+        restored = sum(results)
+        logging.info(f"Restored {restored}/{len(states)} players in {time.perf_counter() - start:.2f}s")
+        return restored
+
+    @staticmethod
+    def _has_player(bot: discord.Bot, guild_id: int) -> bool:
+        guild = bot.get_guild(guild_id)
+        # A player left behind by a dropped connection doesn't count.
+        return guild is not None and guild.voice_client is not None and getattr(guild.voice_client, "connected", True)
+
+    async def _restore_one(self, bot: discord.Bot, state: dict) -> bool:
+        guild = bot.get_guild(state["guild_id"])
+        if guild is None:
+            # The guild belongs to another shard cluster (or we were removed from it).
+            return False
+        channel = guild.get_channel(state["channel_id"])
+        if channel is None:
+            self.forget(state["guild_id"])
+            return False
+
+        player, _ = await voice_sessions.connect(channel, cls=lavalink_manager.BalancedPlayer, move=False)
+        player.queue = wavelink.Queue()
+        idle_policy.apply(player)
+        if state["queue"]:
+            player.queue.put([wavelink.Playable(data) for data in state["queue"]])
+        if state["current"]:
+            await player.play(wavelink.Playable(state["current"]), start=state["position"], volume=state["volume"])
+        else:
+            await player.set_volume(state["volume"])
+        return True
+
+# Shared instance used by the music cogs.
+player_state = PlayerStateTracker()
@@ -0,0 +1,110 @@
+import asyncio
+import collections
+import logging
+import time
+import wavelink
+from utils.metrics import metrics
+
+# How many upcoming tracks to keep validated while the current one plays.
+PREFETCH_DEPTH = 2
+# Tracks resolved longer ago than this are re-resolved before they play.
+REVALIDATE_AFTER = 15 * 60
+
+def mark_resolved(tracks) -> None:
+    """Stamp freshly resolved tracks so the prefetcher knows how old they are."""
+    for track in tracks:
+        track.extras = {"resolved_at": time.time()}
+
+def resolved_at(track: wavelink.Playable) -> float:
+    return getattr(track.extras, "resolved_at", 0.0)
+
+class TrackPrefetcher:
+    """
+    Keeps the next few queued tracks resolved and loadable ahead of time so the
+    track end handler only has to call player.play, and records how long each
+    transition took from the end of one track to the start of the next.
+    """
+
+    def __init__(self, depth: int = PREFETCH_DEPTH, revalidate_after: float = REVALIDATE_AFTER):
+        self.depth = depth
+        self.revalidate_after = revalidate_after
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._transitions_started: dict[int, float] = {}
+        self.transition_times: collections.deque = collections.deque(maxlen=1000)
+        self.revalidated = 0
+        self.skipped = 0
+
+    def schedule(self, player: wavelink.Player) -> None:
+        """Start (or restart) prefetching the upcoming tracks of this player."""
+        if not hasattr(player, "queue") or player.guild is None:
+            return
+        guild_id = player.guild.id
+        task = self._tasks.get(guild_id)
+        if task is not None and not task.done():
+            task.cancel()
+        task = asyncio.create_task(self._prefetch(player))
+        self._tasks[guild_id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(guild_id, None) if self._tasks.get(guild_id) is t else None)
+
+    async def _prefetch(self, player: wavelink.Player) -> None:
+        index = 0
+        while index < min(self.depth, len(player.queue)):
+            track = player.queue.peek(index)
+            # Tracks without a URI can't be re-resolved, let Lavalink try them as they are.
+            if not track.uri or time.time() - resolved_at(track) < self.revalidate_after:
+                index += 1
+                continue
+            fresh = await self._resolve(track)
+            try:
+                position = player.queue.index(track)
+            except ValueError:
+                # The track was played or removed while we were resolving it.
+                continue
+            player.queue.delete(position)
+            if fresh is None:
+                self.skipped += 1
+                logging.info(f"Skipping track that failed to load in guild {player.guild.id}: {track.title}")
+                continue
+            player.queue.put_at(position, fresh)
+            self.revalidated += 1
+            index += 1
+
+    async def _resolve(self, track: wavelink.Playable):
+        """Re-resolve a track from its URI, returning None if it no longer loads."""
+        metrics.increment("lavalink_search_calls_total")
+        try:
+            results = await wavelink.Playable.search(track.uri)
+        except (wavelink.LavalinkLoadException, wavelink.LavalinkException) as e:
+            logging.error(f"Failed to re-resolve track {track.uri}: {e}")
+            return None
+        if not results:
+            return None
+        fresh = results[0]
+        mark_resolved([fresh])
+        return fresh
+
+    def start_transition(self, player: wavelink.Player) -> None:
+        self._transitions_started[player.guild.id] = time.perf_counter()
+
+    def finish_transition(self, player: wavelink.Player) -> None:
+        started = self._transitions_started.pop(player.guild.id, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        self.transition_times.append(elapsed)
+        if metrics.enabled:
+            metrics.observe("track.transition", elapsed)
+        logging.info(f"Time to next audio in guild {player.guild.id}: {elapsed * 1000:.1f}ms")
+
+    def stats(self) -> dict:
+        times = sorted(self.transition_times)
+        return {
+            "transitions": len(times),
+            "median_ms": times[len(times) // 2] * 1000 if times else 0.0,
+            "max_ms": times[-1] * 1000 if times else 0.0,
+            "revalidated": self.revalidated,
+            "skipped": self.skipped,
+        }
+
+# Shared instance used by the music cogs.
+track_prefetcher = TrackPrefetcher()
@@ -0,0 +1,94 @@
+"""
+Pre-rendered responses for the high-frequency commands.
+
+Replies the music cogs send over and over are rendered once here as
+constants or format templates. The /info embed's static fields (the bot's
+name, id and avatar, and the server's name and id) are built once per guild
+and reused until the guild or the bot user changes, so each call only
+renders its dynamic fields: latency, shard and the invoking user.
+"""
+import collections
+import typing
+import discord
+
+NOT_CONNECTED = "I'm not connected to a voice channel."
+RATE_LIMITED = "Slow down! Too many music commands in this server, try again in a moment."
+COMMAND_FAILED = "An error occurred while processing your request."
+NOTHING_PLAYING = "Nothing is playing."
+NOTHING_QUEUED = "**Currently Playing:** Nothing\n\nThe queue is empty."
+NO_MORE_TRACKS = "No more tracks in queue."
+PLAYBACK_STOPPED = "Playback stopped and queue cleared."
+VOLUME_OUT_OF_RANGE = "Volume must be between 0 and 1000."
+AUTOPLAY_ON = "Autoplay is on: similar tracks will play when the queue runs out."
+AUTOPLAY_OFF = "Autoplay is off."
+
+NOW_PLAYING = "Now playing: `{}`"
+ADDED_TO_QUEUE = "Added to queue: `{}`"
+SKIPPED = "Skipped track: `{}`\n"
+NO_RESULTS = "No results found for `{}`."
+VOLUME_SET = "Volume set to {}%."
+EFFECTS_SET = "Effects: {}."
+
+PONG = "Pong! 🏓 Latency: {}ms"
+PONG_SHARDED = "Pong! 🏓 Latency: {}ms (shard {})\nShards: {}"
+
+# Guilds whose /info fields are kept; the least recently added are dropped first.
+MAX_CACHED_GUILDS = 10000
+
+INFO_TITLE = "Bot Information"
+INFO_COLOUR = discord.Colour(0x7289DA)
+
+def field(name: str, value: typing.Any) -> discord.EmbedField:
+    return discord.EmbedField(name=name, value=str(value), inline=True)
+
+class InfoEmbeds:
+    """
+    Renders /info embeds from fields built once per guild.
+
+    The cached fields are shared by every embed rendered from them, which
+    is safe because embeds only read their fields when they are sent.
+    """
+
+    def __init__(self):
+        self._bot_fields: typing.Optional[tuple[str, list[discord.EmbedField]]] = None
+        self._guild_fields: collections.OrderedDict[int, list[discord.EmbedField]] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _bot(self, user: discord.ClientUser) -> tuple[str, list[discord.EmbedField]]:
+        if self._bot_fields is None:
+            self._bot_fields = (user.display_avatar.url, [field("Bot Name", user.name), field("Bot ID", user.id)])
+        return self._bot_fields
+
+    def _guild(self, guild: discord.Guild) -> list[discord.EmbedField]:
+        fields = self._guild_fields.get(guild.id)
+        if fields is None:
+            self.misses += 1
+            fields = self._guild_fields[guild.id] = [field("Server Name", guild.name), field("Server ID", guild.id)]
+            if len(self._guild_fields) > MAX_CACHED_GUILDS:
+                self._guild_fields.popitem(last=False)
+        else:
+            self.hits += 1
+        return fields
+
+    def render(self, bot: discord.Bot, guild: discord.Guild, user: discord.abc.User, latency: float,
+               shard: typing.Optional[str] = None) -> discord.Embed:
+        avatar_url, bot_fields = self._bot(bot.user)
+        fields = [*bot_fields, field("Bot Latency", f"{round(latency * 1000)}ms")]
+        if shard is not None:
+            fields.append(field("Shard", shard))
+        fields += self._guild(guild)
+        fields += (field("User Name", user.name), field("User ID", user.id))
+        return discord.Embed(title=INFO_TITLE, colour=INFO_COLOUR, thumbnail=avatar_url, fields=fields)
+
+    def invalidate_guild(self, guild_id: int) -> None:
+        self._guild_fields.pop(guild_id, None)
+
+    def invalidate_bot(self) -> None:
+        self._bot_fields = None
+
+    def stats(self) -> dict:
+        return {"guilds": len(self._guild_fields), "hits": self.hits, "misses": self.misses}
+
+# Shared instance used by /info.
+info_embeds = InfoEmbeds()
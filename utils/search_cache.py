@@ -0,0 +1,128 @@
+import asyncio
+import collections
+import logging
+import time
+import typing
+
+# Sentinel stored for searches that returned nothing (negative caching).
+_EMPTY = object()
+
+class _FetchCancelled(Exception):
+    """Set on an in-flight request whose leading caller was cancelled."""
+
+
+class SearchCache:
+    """
+    Bounded, process-wide cache of search results keyed on (query, source).
+
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_size` is reached. Empty results are remembered for the
+    shorter `negative_ttl` so repeated misses don't hit Lavalink either.
+    Concurrent lookups for the same key share a single in-flight request.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0, negative_ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "collections.OrderedDict[tuple, tuple[float, typing.Any]]" = collections.OrderedDict()
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, source: typing.Any = None) -> tuple:
+        """Normalize a query so trivially different spellings share an entry."""
+        query = " ".join(query.split())
+        # URLs are case sensitive past the host, plain searches are not.
+        if not query.startswith("http"):
+            query = query.casefold()
+        return (query, str(source) if source is not None else None)
+
+    def get(self, key: tuple) -> typing.Any:
+        """Return the cached value for key, None if the search was empty, or raise KeyError."""
+        entry = self._entries.get(key)
+        if entry is None:
+            raise KeyError(key)
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            raise KeyError(key)
+        self._entries.move_to_end(key)
+        return None if value is _EMPTY else value
+
+    def put(self, key: tuple, value: typing.Any) -> None:
+        ttl = self.ttl if value else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, value if value else _EMPTY)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_fetch(self, key: tuple, fetch: typing.Callable[[], typing.Awaitable[typing.Any]]) -> typing.Any:
+        """
+        Return the cached value for key, calling `fetch` on a miss.
+        Exceptions raised by `fetch` are propagated to every waiter and not cached.
+        If the caller doing the fetch is cancelled, its waiters fetch again themselves.
+        """
+        try:
+            value = self.get(key)
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _FetchCancelled:
+                # Only the caller that was fetching was cancelled, not this one.
+                return await self.get_or_fetch(key, fetch)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel every waiter along with it.
+            future.set_exception(_FetchCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                # Mark the exception as retrieved when nobody else was waiting.
+                future.exception()
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def log_stats(self) -> None:
+        logging.info(f"Search cache stats: {self.stats()}")
+
+
+# Shared instance used by the music cogs.
+track_cache = SearchCache()
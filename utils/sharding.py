@@ -0,0 +1,215 @@
+"""
+Sharding support.
+
+SHARDING.MODE in config.json selects how the bot connects to the gateway:
+- "none" (default): a single discord.Bot connection.
+- "auto": one process running discord.AutoShardedBot with every shard.
+- "cluster": run `python -m utils.sharding` to start a local coordinator that
+  splits the shards across SHARDING.CLUSTERS worker processes (each one is
+  main.py with a shard range), shares the Lavalink node list with them and
+  aggregates their stats at http://127.0.0.1:COORDINATOR_PORT/stats.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import typing
+import urllib.request
+import aiohttp
+import discord
+from aiohttp import web
+from utils.config import ConfigError, read_config
+
+DEFAULT_COORDINATOR_PORT = 9200
+# Seconds between stats reports from a worker to the coordinator.
+STATS_INTERVAL = 15
+# Seconds to wait before restarting a worker that exited with an error.
+RESTART_DELAY = 5
+
+def shard_options(sharding_config: dict) -> typing.Optional[dict]:
+    """
+    Return the AutoShardedBot keyword arguments for this process, or None to run unsharded.
+    Worker processes started by the coordinator get their shard range from the environment.
+    """
+    shard_ids = os.environ.get("DAVE_SHARD_IDS")
+    if shard_ids:
+        return {
+            "shard_ids": [int(shard_id) for shard_id in shard_ids.split(",")],
+            "shard_count": int(os.environ["DAVE_SHARD_COUNT"]),
+        }
+    if sharding_config.get("MODE", "none") == "auto":
+        # A shard_count of None lets the library use Discord's recommendation.
+        return {"shard_count": sharding_config.get("SHARD_COUNT")}
+    return None
+
+def shard_latencies(bot: discord.Bot) -> dict[int, float]:
+    """Latency of every shard this process runs, keyed on shard id."""
+    if isinstance(bot, discord.AutoShardedBot):
+        return dict(bot.latencies)
+    return {0: bot.latency}
+
+def guild_shard_latency(bot: discord.Bot, guild: typing.Optional[discord.Guild]) -> tuple[int, float]:
+    """Return (shard_id, latency) for the shard serving this guild."""
+    latencies = shard_latencies(bot)
+    # Partial guilds (and test doubles) may not carry a shard id; unsharded bots only have shard 0.
+    shard_id = getattr(guild, "shard_id", 0) if guild is not None else 0
+    return shard_id, latencies.get(shard_id, bot.latency)
+
+def fetch_shared_config() -> typing.Optional[dict]:
+    """Fetch the config sections shared by the coordinator, if this process is a cluster worker."""
+    url = os.environ.get("DAVE_COORDINATOR_URL")
+    if not url:
+        return None
+    with urllib.request.urlopen(f"{url}/config", timeout=10) as response:
+        return json.load(response)
+
+def worker_log_file(log_file: str) -> str:
+    """
+    The log file for this process. Each cluster worker rotates its own file
+    (logs/bot.log becomes logs/bot.1.log for cluster 1), so workers never
+    rename a file another process is writing to.
+    """
+    cluster_id = os.environ.get("DAVE_CLUSTER_ID")
+    if cluster_id is None:
+        return log_file
+    root, extension = os.path.splitext(log_file)
+    return f"{root}.{cluster_id}{extension}"
+
+def worker_port(port: int) -> int:
+    """The port this process serves on: cluster workers each add their cluster id so they don't collide."""
+    return port + int(os.environ.get("DAVE_CLUSTER_ID", "0"))
+
+async def report_stats(bot: discord.Bot, collect: typing.Callable[[], dict]):
+    """Periodically send this worker's stats to the coordinator."""
+    url = os.environ.get("DAVE_COORDINATOR_URL")
+    cluster_id = os.environ.get("DAVE_CLUSTER_ID")
+    if not url or cluster_id is None:
+        return
+    await bot.wait_until_ready()
+    async with aiohttp.ClientSession() as session:
+        while not bot.is_closed():
+            payload = {
+                "shards": {str(shard_id): latency for shard_id, latency in shard_latencies(bot).items()},
+                "guilds": len(bot.guilds),
+                "players": len(bot.voice_clients),
+                **collect(),
+            }
+            try:
+                async with session.post(f"{url}/stats/{cluster_id}", json=payload) as response:
+                    response.raise_for_status()
+            except aiohttp.ClientError as e:
+                logging.error(f"Failed to report stats to the shard coordinator: {e}")
+            await asyncio.sleep(STATS_INTERVAL)
+
+def split_shards(shard_count: int, clusters: int) -> list[list[int]]:
+    """Split shard ids into contiguous ranges, one per cluster."""
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for index in range(clusters):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+async def recommended_shard_count(token: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"}
+        ) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+class ShardCoordinator:
+    """Spawns the worker processes and serves shared config and aggregated stats to them."""
+
+    def __init__(self, config: dict, config_path: typing.Optional[str] = None):
+        self.config = config
+        self.config_path = config_path
+        sharding = config.get("SHARDING", {})
+        self.clusters = sharding.get("CLUSTERS", os.cpu_count() or 1)
+        self.port = sharding.get("COORDINATOR_PORT", DEFAULT_COORDINATOR_PORT)
+        self.shard_count = sharding.get("SHARD_COUNT")
+        self.stats: dict[str, dict] = {}
+
+    async def handle_config(self, request: web.Request) -> web.Response:
+        # Re-read the file so workers reloading their config get the current node list.
+        if self.config_path:
+            try:
+                self.config = await asyncio.to_thread(read_config, self.config_path)
+            except (OSError, ValueError, ConfigError) as e:
+                logging.error(f"Failed to re-read {self.config_path}, serving the previous config: {e}")
+        # Only the sections workers need; the token stays in each worker's own config file.
+        return web.json_response({"LAVALINK": self.config.get("LAVALINK", {})})
+
+    async def handle_report(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        payload["reported_at"] = time.time()
+        self.stats[request.match_info["cluster"]] = payload
+        return web.Response(status=204)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.aggregate())
+
+    def aggregate(self) -> dict:
+        shards, counters = {}, {}
+        for report in self.stats.values():
+            shards.update(report.get("shards", {}))
+            for name, value in report.get("counters", {}).items():
+                counters[name] = counters.get(name, 0) + value
+        return {
+            "clusters": self.stats,
+            "shard_count": self.shard_count,
+            "guilds": sum(report.get("guilds", 0) for report in self.stats.values()),
+            "players": sum(report.get("players", 0) for report in self.stats.values()),
+            "shard_latencies": dict(sorted(shards.items(), key=lambda item: int(item[0]))),
+            "counters": counters,
+        }
+
+    async def run_worker(self, cluster_id: int, shard_ids: list[int]):
+        env = {
+            **os.environ,
+            "DAVE_CLUSTER_ID": str(cluster_id),
+            "DAVE_SHARD_IDS": ",".join(str(shard_id) for shard_id in shard_ids),
+            "DAVE_SHARD_COUNT": str(self.shard_count),
+            "DAVE_COORDINATOR_URL": f"http://127.0.0.1:{self.port}",
+        }
+        while True:
+            logging.info(f"Starting cluster {cluster_id} with shards {shard_ids[0]}-{shard_ids[-1]}")
+            process = await asyncio.create_subprocess_exec(sys.executable, "main.py", env=env)
+            code = await process.wait()
+            if code == 0:
+                logging.info(f"Cluster {cluster_id} exited.")
+                return
+            logging.error(f"Cluster {cluster_id} exited with code {code}, restarting in {RESTART_DELAY}s")
+            await asyncio.sleep(RESTART_DELAY)
+
+    async def run(self):
+        if not self.shard_count:
+            self.shard_count = await recommended_shard_count(self.config["DISCORD"]["DISCORD_TOKEN"])
+
+        app = web.Application()
+        app.router.add_get("/config", self.handle_config)
+        app.router.add_post("/stats/{cluster}", self.handle_report)
+        app.router.add_get("/stats", self.handle_stats)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", self.port).start()
+        logging.info(f"Shard coordinator listening on 127.0.0.1:{self.port} for {self.shard_count} shards")
+
+        try:
+            await asyncio.gather(*(
+                self.run_worker(cluster_id, shard_ids)
+                for cluster_id, shard_ids in enumerate(split_shards(self.shard_count, self.clusters))
+            ))
+        finally:
+            await runner.cleanup()
+
+if __name__ == "__main__":
+    from utils import discord_logger
+    discord_logger.setup_logging("logs/coordinator.log")
+    config_path = sys.argv[1] if len(sys.argv) > 1 else "data/config.json"
+    asyncio.run(ShardCoordinator(read_config(config_path), config_path).run())
@@ -0,0 +1,195 @@
+import asyncio
+import contextlib
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pathlib
+import time
+import discord
+from utils import lavalink_manager
+
+# Extensions under these packages are only loaded once Lavalink is ready
+# (or a music command arrives first), since they are useless without it.
+DEFERRED_PACKAGES = ("cogs.music",)
+# Give up waiting for Lavalink after this many seconds and load them anyway.
+DEFERRED_LOAD_TIMEOUT = 30
+COMMAND_HASH_FILE = "data/command_hash.txt"
+
+class StartupTimer:
+    """Records how long each startup phase took."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def report(self) -> str:
+        parts = [f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items()]
+        parts.append(f"total={(time.perf_counter() - self.started) * 1000:.0f}ms")
+        return "Startup timing: " + ", ".join(parts)
+
+def discover_extensions(cogs_dir: str = "cogs") -> tuple[list[str], list[str]]:
+    """Return (eager, deferred) extension names found under cogs_dir."""
+    eager, deferred = [], []
+    for path in sorted(pathlib.Path(cogs_dir).rglob("*.py")):
+        if path.stem == "__init__":
+            continue
+        cog_path = ".".join(path.with_suffix("").parts)
+        if cog_path.startswith(DEFERRED_PACKAGES):
+            deferred.append(cog_path)
+        else:
+            eager.append(cog_path)
+    return eager, deferred
+
+async def load_extensions(bot: discord.Bot, names: list[str]) -> list[str]:
+    """
+    Load the given extensions, returning the names that failed.
+    Modules and their dependencies are imported concurrently in worker threads
+    first, so the sequential load_extension calls only have to run setup().
+    """
+    results = await asyncio.gather(
+        *(asyncio.to_thread(importlib.import_module, name) for name in names),
+        return_exceptions=True
+    )
+    failed = []
+    for name, result in zip(names, results):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            bot.load_extension(name)
+            logging.info(f"Loaded cog: {name}")
+        except Exception as e:
+            logging.error(f"Failed to load cog {name}: {e}")
+            failed.append(name)
+    return failed
+
+def command_hash(bot: discord.Bot) -> str:
+    payload = [command.to_dict() for command in bot.pending_application_commands]
+    payload.sort(key=lambda command: command["name"])
+    data = json.dumps({"commands": payload, "guilds": bot.debug_guilds}, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+async def load_registered_commands(bot: discord.Bot) -> list[discord.ApplicationCommand]:
+    """
+    Match the local commands to the ones Discord already has, without registering
+    anything, and return the local commands Discord doesn't know.
+
+    py-cord only dispatches a global command once it knows the command's Discord
+    id, which it normally learns while syncing; a skipped sync has to fill that
+    registry itself.
+    """
+    remote = [(None, await bot.http.get_global_commands(bot.user.id))]
+    for guild_id in bot.debug_guilds or ():
+        remote.append((guild_id, await bot.http.get_guild_commands(bot.user.id, guild_id)))
+
+    matched = set()
+    for guild_id, registered in remote:
+        for data in registered:
+            command = discord.utils.find(
+                lambda command: command.name == data["name"] and command.type == data.get("type")
+                and (command.guild_ids is None if guild_id is None else guild_id in (command.guild_ids or ())),
+                bot.pending_application_commands,
+            )
+            if command is None:
+                continue
+            command.id = data["id"]
+            # The same registry sync_commands() fills; py-cord has no public way to add to it.
+            bot._application_commands[command.id] = command
+            matched.add(id(command))
+    return [command for command in bot.pending_application_commands if id(command) not in matched]
+
+async def sync_commands_if_changed(bot: discord.Bot, hash_file: str = COMMAND_HASH_FILE) -> bool:
+    """Sync application commands unless they match the last synced hash. Returns True if synced."""
+    current = command_hash(bot)
+    path = pathlib.Path(hash_file)
+    try:
+        previous = path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        previous = None
+
+    if previous == current:
+        missing = await load_registered_commands(bot)
+        if not missing:
+            logging.info("Application commands unchanged since last sync, skipping sync.")
+            return False
+        logging.warning(f"Commands missing from Discord despite an unchanged hash: {[c.name for c in missing]}")
+
+    await bot.sync_commands()
+    try:
+        path.write_text(current, encoding="utf-8")
+    except OSError as e:
+        logging.error(f"Failed to store command hash: {e}")
+    logging.info("Application commands synced.")
+    return True
+
+class StartupPipeline:
+    """
+    Loads cogs and syncs application commands as fast as possible.
+
+    Utility cogs are loaded right away, music cogs once the Lavalink pool is
+    ready (or the first music command arrives), and commands are synced a
+    single time once everything is loaded.
+    """
+
+    def __init__(self, bot: discord.Bot, cogs_dir: str = "cogs"):
+        self.bot = bot
+        self.timer = StartupTimer()
+        self.eager, self.deferred = discover_extensions(cogs_dir)
+        self.failed: list[str] = []
+        self._deferred_lock = asyncio.Lock()
+        self.deferred_loaded = not self.deferred
+
+    async def load_deferred(self, reason: str):
+        async with self._deferred_lock:
+            if self.deferred_loaded:
+                return
+            with self.timer.phase("deferred_cogs"):
+                self.failed += await load_extensions(self.bot, self.deferred)
+            self.deferred_loaded = True
+            logging.info(f"Loaded deferred cogs ({reason}).")
+
+    def is_pending_command(self, name: str) -> bool:
+        """True if the command is unknown because its cog has not been loaded yet."""
+        if self.deferred_loaded:
+            return False
+        # The registry of synced commands is empty until the sync, so look at what the loaded cogs added.
+        return not any(command.name == name for command in self.bot.pending_application_commands)
+
+    async def run(self):
+        with self.timer.phase("eager_cogs"):
+            self.failed += await load_extensions(self.bot, self.eager)
+
+        with self.timer.phase("gateway_ready"):
+            await self.bot.wait_until_ready()
+
+        try:
+            await asyncio.wait_for(lavalink_manager.pool_ready.wait(), timeout=DEFERRED_LOAD_TIMEOUT)
+            await self.load_deferred("Lavalink pool ready")
+        except asyncio.TimeoutError:
+            await self.load_deferred("timed out waiting for Lavalink")
+
+        # In a sharded cluster only the first worker registers commands; the
+        # others still need their ids to dispatch them.
+        with self.timer.phase("command_sync"):
+            try:
+                if os.environ.get("DAVE_CLUSTER_ID", "0") == "0":
+                    await sync_commands_if_changed(self.bot)
+                else:
+                    missing = await load_registered_commands(self.bot)
+                    if missing:
+                        logging.warning(f"Commands not registered yet by cluster 0: {[c.name for c in missing]}")
+            except Exception as e:
+                logging.error(f"Failed to sync application commands: {e}")
+
+        if self.failed:
+            logging.error(f"Cogs failed to load: {self.failed}")
+        logging.info(self.timer.report())
@@ -0,0 +1,248 @@
+import asyncio
+import bisect
+import heapq
+import itertools
+import json
+import logging
+import sqlite3
+import time
+import typing
+import discord
+import wavelink
+
+DEFAULT_DB_PATH = "data/tracks.db"
+# The index keeps at most this many tracks, evicting the least played ones.
+DEFAULT_MAX_TRACKS = 20000
+# Seconds between flushes of new tracks and play counts to disk.
+FLUSH_INTERVAL = 30
+# Discord allows at most 25 autocomplete choices of up to 100 characters.
+MAX_SUGGESTIONS = 25
+MAX_CHOICE_LENGTH = 100
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+class TrackRecord:
+    """The compact parts of a resolved track needed to play it again."""
+
+    __slots__ = ("encoded", "title", "author", "length", "source", "info", "play_count", "last_played")
+
+    def __init__(self, encoded: str, title: str, author: str, length: int, source: str, info: str,
+                 play_count: int = 0, last_played: float = 0.0):
+        self.encoded = encoded
+        self.title = title
+        self.author = author
+        self.length = length
+        self.source = source
+        # Track info exactly as Lavalink returned it, kept as a JSON string.
+        self.info = info
+        self.play_count = play_count
+        self.last_played = last_played
+
+    @classmethod
+    def from_playable(cls, track: wavelink.Playable) -> "TrackRecord":
+        return cls(
+            track.encoded,
+            track.title,
+            track.author,
+            track.length,
+            track.source,
+            json.dumps(track.raw_data["info"], separators=(",", ":")),
+        )
+
+    def to_playable(self) -> wavelink.Playable:
+        return wavelink.Playable({"encoded": self.encoded, "info": json.loads(self.info), "pluginInfo": {}, "userData": {}})
+
+    @property
+    def label(self) -> str:
+        return f"{self.author} - {self.title}"
+
+class TrackIndex:
+    """
+    Index of every track the bot has resolved, persisted in SQLite.
+
+    Lookups and autocomplete are served from memory: a dict of exact keys
+    (previous queries, titles and "author - title") and a sorted list of
+    normalized labels and titles for prefix search. New tracks and play counts are
+    written to disk in batches.
+    """
+
+    def __init__(self, max_tracks: int = DEFAULT_MAX_TRACKS):
+        self.max_tracks = max_tracks
+        self.records: dict[str, TrackRecord] = {}
+        self._keys: dict[str, str] = {}
+        # Sorted (normalized label or title, encoded) pairs for prefix search.
+        self._prefixes: list[tuple[str, str]] = []
+        self._dirty: set[str] = set()
+        self._aliases: dict[str, str] = {}
+        self._evicted: set[str] = set()
+        # Most played labels, offered before anything is typed; rebuilt lazily.
+        self._top: typing.Optional[list[str]] = None
+        self._conn: typing.Optional[sqlite3.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def open(self, path: str = DEFAULT_DB_PATH) -> None:
+        """Open the database and load the index into memory."""
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracks ("
+            " encoded TEXT PRIMARY KEY, title TEXT NOT NULL, author TEXT NOT NULL,"
+            " length INTEGER NOT NULL, source TEXT NOT NULL, info TEXT NOT NULL,"
+            " play_count INTEGER NOT NULL, last_played REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS aliases (query TEXT PRIMARY KEY, encoded TEXT NOT NULL)")
+        self._conn.commit()
+
+        for row in self._conn.execute("SELECT * FROM tracks"):
+            self._add(TrackRecord(*row))
+        for query, encoded in self._conn.execute("SELECT query, encoded FROM aliases"):
+            if encoded in self.records:
+                self._keys[query] = encoded
+        self._prefixes.sort()
+
+    def _add(self, record: TrackRecord, sort: bool = False) -> None:
+        self.records[record.encoded] = record
+        self._keys[normalize(record.title)] = record.encoded
+        self._keys[normalize(record.label)] = record.encoded
+        # Long labels are offered cut to the choice length, so the cut label has to resolve too.
+        self._keys.setdefault(normalize(record.label[:MAX_CHOICE_LENGTH]), record.encoded)
+        self._top = None
+        for entry in ((normalize(record.label), record.encoded), (normalize(record.title), record.encoded)):
+            if sort:
+                bisect.insort(self._prefixes, entry)
+            else:
+                self._prefixes.append(entry)
+
+    def knows(self, query: str) -> bool:
+        """Whether the query is one we have resolved before (or an autocomplete choice we offered)."""
+        return normalize(query) in self._keys
+
+    def lookup(self, query: str) -> typing.Optional[wavelink.Playable]:
+        """Return a playable for a query we have resolved before, without asking Lavalink."""
+        encoded = self._keys.get(normalize(query))
+        record = self.records.get(encoded) if encoded else None
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record.to_playable()
+
+    def remember(self, query: str, track: wavelink.Playable) -> None:
+        """Index a resolved track, and the query that resolved to it."""
+        if track.encoded not in self.records:
+            self._add(TrackRecord.from_playable(track), sort=True)
+            self._dirty.add(track.encoded)
+            self._evict(keep=track.encoded)
+        key = normalize(query)
+        if not query.startswith("http") and self._keys.get(key) != track.encoded:
+            self._keys[key] = track.encoded
+            self._aliases[key] = track.encoded
+
+    def record_play(self, track: wavelink.Playable) -> None:
+        record = self.records.get(track.encoded)
+        if record is None:
+            return
+        record.play_count += 1
+        record.last_played = time.time()
+        self._dirty.add(record.encoded)
+        self._top = None
+
+    def suggest(self, prefix: str) -> list[str]:
+        """Autocomplete choices whose "author - title" or title starts with the prefix."""
+        prefix = normalize(prefix)
+        if not prefix:
+            # Nothing typed yet: offer the most played tracks.
+            if self._top is None:
+                records = heapq.nlargest(MAX_SUGGESTIONS, self.records.values(), key=lambda r: r.play_count)
+                self._top = [record.label[:MAX_CHOICE_LENGTH] for record in records]
+            return self._top
+
+        choices, seen = [], set()
+        start = bisect.bisect_left(self._prefixes, (prefix,))
+        for label, encoded in itertools.islice(self._prefixes, start, None):
+            if not label.startswith(prefix) or len(choices) >= MAX_SUGGESTIONS:
+                break
+            # A track can match on both its label and its title.
+            if encoded in seen:
+                continue
+            seen.add(encoded)
+            choices.append(self.records[encoded].label[:MAX_CHOICE_LENGTH])
+        # Exact title matches cover searches that leave out the author.
+        encoded = self._keys.get(prefix)
+        if encoded and encoded not in seen and len(choices) < MAX_SUGGESTIONS:
+            choices.insert(0, self.records[encoded].label[:MAX_CHOICE_LENGTH])
+        return choices
+
+    def _evict(self, keep: typing.Optional[str] = None) -> None:
+        """Drop the least played tenth of the index once it is over capacity, never the track just added."""
+        if len(self.records) <= self.max_tracks:
+            return
+        count = max(1, self.max_tracks // 10)
+        candidates = (record for record in self.records.values() if record.encoded != keep)
+        victims = heapq.nsmallest(count, candidates, key=lambda r: (r.play_count, r.last_played))
+        evicted = {record.encoded for record in victims}
+        for encoded in evicted:
+            del self.records[encoded]
+        self._keys = {key: encoded for key, encoded in self._keys.items() if encoded not in evicted}
+        self._aliases = {key: encoded for key, encoded in self._aliases.items() if encoded not in evicted}
+        self._prefixes = [entry for entry in self._prefixes if entry[1] not in evicted]
+        self._dirty -= evicted
+        self._evicted |= evicted
+        self._top = None
+
+    def _write(self, records: list[TrackRecord], aliases: dict[str, str], evicted: set[str]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (r.encoded, r.title, r.author, r.length, r.source, r.info, r.play_count, r.last_played)
+                    for r in records
+                ]
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO aliases VALUES (?, ?)", list(aliases.items()))
+            self._conn.executemany("DELETE FROM tracks WHERE encoded = ?", [(encoded,) for encoded in evicted])
+            self._conn.executemany("DELETE FROM aliases WHERE encoded = ?", [(encoded,) for encoded in evicted])
+
+    async def flush(self) -> None:
+        if self._conn is None or not (self._dirty or self._aliases or self._evicted):
+            return
+        records = [self.records[encoded] for encoded in self._dirty if encoded in self.records]
+        aliases, evicted = self._aliases, self._evicted
+        self._dirty, self._aliases, self._evicted = set(), {}, set()
+        async with self._write_lock:
+            try:
+                await asyncio.to_thread(self._write, records, aliases, evicted)
+            except sqlite3.Error as e:
+                logging.error(f"Failed to write track index: {e}")
+
+    async def run(self, bot: discord.Bot):
+        """Load the index and flush changes until the bot closes."""
+        index_config = bot.config.get("TRACK_INDEX", {})
+        self.max_tracks = index_config.get("MAX_TRACKS", self.max_tracks)
+        path = index_config.get("PATH", DEFAULT_DB_PATH)
+        try:
+            await asyncio.to_thread(self.open, path)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to open track index {path}: {e}")
+            return
+        logging.info(f"Loaded {len(self.records)} tracks into the track index")
+
+        try:
+            while not bot.is_closed():
+                await asyncio.sleep(FLUSH_INTERVAL)
+                await self.flush()
+        finally:
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {"tracks": len(self.records), "hits": self.hits, "misses": self.misses}
+
+# Shared instance used by the music cogs.
+track_index = TrackIndex()
+
+async def autocomplete_tracks(ctx: discord.AutocompleteContext) -> list[str]:
+    """Slash command autocomplete for previously played tracks."""
+    return track_index.suggest(ctx.value or "")
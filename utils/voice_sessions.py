@@ -0,0 +1,222 @@
+import asyncio
+import collections
+import logging
+import random
+import time
+import typing
+import discord
+import wavelink
+from utils.metrics import metrics
+
+# Voice handshakes allowed at the same time across all guilds.
+DEFAULT_MAX_CONCURRENT_CONNECTS = 5
+# Seconds to wait for one voice handshake.
+DEFAULT_CONNECT_TIMEOUT = 10.0
+# Attempts per connect, and the backoff between them (doubling up to the max).
+DEFAULT_CONNECT_ATTEMPTS = 4
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 30.0
+
+# Voice handshake failures that are worth retrying.
+RETRYABLE_ERRORS = (asyncio.TimeoutError, wavelink.ChannelTimeoutException, discord.ConnectionClosed)
+
+class VoiceSession:
+    """Connection state of one guild's voice session."""
+
+    __slots__ = ("channel_id", "state", "attempts", "since")
+
+    def __init__(self, channel_id: int, state: str):
+        self.channel_id = channel_id
+        self.state = state
+        self.attempts = 0
+        self.since = time.monotonic()
+
+    def set(self, state: str, channel_id: typing.Optional[int] = None) -> None:
+        self.state = state
+        if channel_id is not None:
+            self.channel_id = channel_id
+        self.since = time.monotonic()
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """Exponential backoff with jitter, so guilds that failed together don't retry together."""
+    delay = min(maximum, base * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+class VoiceSessionManager:
+    """
+    Owns every voice connection the bot makes.
+
+    connect() reuses a live connection, moves an idle player to the caller's
+    channel instead of reconnecting, replaces stale players and otherwise
+    performs the handshake. Handshakes share a global concurrency cap and are
+    retried with jittered backoff, so restoring or failing over hundreds of
+    players after an outage doesn't flood the gateway.
+    """
+
+    def __init__(self):
+        self.max_concurrent = DEFAULT_MAX_CONCURRENT_CONNECTS
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT
+        self.attempts = DEFAULT_CONNECT_ATTEMPTS
+        self.backoff_base = DEFAULT_BACKOFF_BASE
+        self.backoff_max = DEFAULT_BACKOFF_MAX
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._locks: collections.defaultdict = collections.defaultdict(asyncio.Lock)
+        self.sessions: dict[int, VoiceSession] = {}
+        # Guilds we are leaving on purpose, so their disconnect isn't reported as unexpected.
+        self._leaving: set[int] = set()
+        self.counts = collections.Counter()
+
+    def configure(self, config: dict) -> None:
+        self.connect_timeout = config.get("CONNECT_TIMEOUT", self.connect_timeout)
+        self.attempts = config.get("CONNECT_ATTEMPTS", self.attempts)
+        self.backoff_base = config.get("BACKOFF_BASE", self.backoff_base)
+        self.backoff_max = config.get("BACKOFF_MAX", self.backoff_max)
+        max_concurrent = config.get("MAX_CONCURRENT_CONNECTS", self.max_concurrent)
+        if max_concurrent != self.max_concurrent:
+            # Handshakes already waiting keep the old limit; new ones use the new one.
+            self.max_concurrent = max_concurrent
+            self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def _count(self, event: str) -> None:
+        self.counts[event] += 1
+        metrics.increment(f"voice_{event}_total")
+
+    async def connect(self, channel: discord.VoiceChannel, cls: type = wavelink.Player,
+                      move: bool = True) -> tuple[wavelink.Player, bool]:
+        """
+        Return (player, created) for the guild, connected to channel.
+        An existing player in another channel is moved only if move is True and
+        it isn't playing; otherwise ValueError is raised.
+        """
+        guild = channel.guild
+        # Two commands arriving together must not both start a handshake.
+        async with self._locks[guild.id]:
+            player = guild.voice_client
+            if player is not None and getattr(player, "connected", False):
+                if player.channel is not None and player.channel.id == channel.id:
+                    self._count("reuses")
+                    return player, False
+                if not move or player.playing:
+                    raise ValueError("You must be in the same voice channel as the bot.")
+                session = self.sessions.setdefault(guild.id, VoiceSession(channel.id, "moving"))
+                session.set("moving", channel.id)
+                try:
+                    await player.move_to(channel)
+                finally:
+                    session.set("connected", player.channel.id if player.channel else channel.id)
+                self._count("moves")
+                return player, False
+
+            if player is not None:
+                # Left over from a dropped connection or a dead node.
+                self._count("stale_cleanups")
+                self.sessions.pop(guild.id, None)
+                self._leaving.add(guild.id)
+                try:
+                    await player.disconnect(force=True)
+                except Exception as e:
+                    logging.error(f"Failed to clean up stale player for guild {guild.id}: {e}")
+                finally:
+                    self._leaving.discard(guild.id)
+
+            return await self._handshake(channel, cls), True
+
+    async def _handshake(self, channel: discord.VoiceChannel, cls: type) -> wavelink.Player:
+        guild_id = channel.guild.id
+        session = self.sessions[guild_id] = VoiceSession(channel.id, "connecting")
+        while True:
+            try:
+                async with self._semaphore:
+                    with metrics.timer("voice.connect"):
+                        player = await channel.connect(cls=cls, timeout=self.connect_timeout)
+                session.set("connected")
+                self._count("connects")
+                return player
+            except RETRYABLE_ERRORS as e:
+                await self._discard_failed_client(channel.guild)
+                session.attempts += 1
+                if session.attempts >= self.attempts:
+                    self.sessions.pop(guild_id, None)
+                    self._count("connect_failures")
+                    raise
+                delay = backoff_delay(session.attempts - 1, self.backoff_base, self.backoff_max)
+                logging.warning(f"Voice connect to guild {guild_id} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                session.set("backoff")
+                self._count("connect_retries")
+                await asyncio.sleep(delay)
+                session.set("connecting")
+            except Exception:
+                self.sessions.pop(guild_id, None)
+                self._count("connect_failures")
+                raise
+
+    async def _discard_failed_client(self, guild: discord.Guild) -> None:
+        """
+        A timed out handshake leaves its player registered on the guild and
+        the node, and the next channel.connect() would then fail with "Already
+        connected to a voice channel".
+        """
+        player = guild.voice_client
+        if player is None:
+            return
+        try:
+            await player.disconnect(force=True)
+        except Exception as e:
+            logging.warning(f"Failed to clean up the voice client of a failed connect in guild {guild.id}: {e}")
+
+    async def disconnect(self, player: wavelink.Player) -> None:
+        guild_id = player.guild.id
+        self._leaving.add(guild_id)
+        try:
+            await player.disconnect()
+        except Exception as e:
+            if player.guild is None:
+                raise
+            # The player's node is unreachable; leave the channel without telling it.
+            logging.warning(f"Lavalink didn't acknowledge the disconnect in guild {guild_id}: {e}")
+            await player.guild.change_voice_state(channel=None)
+        finally:
+            self._leaving.discard(guild_id)
+            self.sessions.pop(guild_id, None)
+
+    def register_listeners(self, bot: discord.Bot, on_moved: typing.Callable[[wavelink.Player], None]):
+        """Track the bot's own voice state: moves by other users and unexpected disconnects."""
+        @bot.listen("on_voice_state_update")
+        async def track_voice_state(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+            if bot.user is None or member.id != bot.user.id:
+                return
+            guild_id = member.guild.id
+            session = self.sessions.get(guild_id)
+            if after.channel is None:
+                # A late event for a connection we already replaced says nothing about the new one.
+                if session is None or session.state in ("connecting", "backoff"):
+                    return
+                del self.sessions[guild_id]
+                if guild_id not in self._leaving:
+                    self._count("unexpected_disconnects")
+                    logging.warning(f"Voice connection in guild {guild_id} was closed by Discord or a moderator")
+                return
+            if before.channel is not None and before.channel.id != after.channel.id:
+                if session is not None and (session.state == "moving" or session.channel_id == after.channel.id):
+                    # Our own move_to.
+                    return
+                # Moved by someone else: follow the new channel instead of reconnecting.
+                self.sessions.setdefault(guild_id, VoiceSession(after.channel.id, "connected")).set("connected", after.channel.id)
+                self._count("external_moves")
+                player = member.guild.voice_client
+                if isinstance(player, wavelink.Player):
+                    on_moved(player)
+
+    def forget(self, guild_id: int) -> None:
+        lock = self._locks.get(guild_id)
+        if lock is not None and not lock.locked():
+            del self._locks[guild_id]
+
+    def stats(self) -> dict:
+        return {
+            "states": dict(collections.Counter(session.state for session in self.sessions.values())),
+            **self.counts,
+        }
+
+# Shared instance used by the music cogs, the node failover and the player restore.
+voice_sessions = VoiceSessionManager()